@@ -0,0 +1,55 @@
+"""add product_cards read model
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'product_cards',
+        sa.Column('product_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('slug', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('subtitle', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('original_price', sa.Float(), nullable=True),
+        sa.Column('category', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('main_image_url', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('color_count', sa.Integer(), nullable=False),
+        sa.Column('in_stock', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('product_id'),
+        sa.UniqueConstraint('slug'),
+    )
+    op.create_index('ix_product_cards_created_at', 'product_cards', ['created_at', 'product_id'])
+    op.create_index('ix_product_cards_price', 'product_cards', ['price', 'product_id'])
+    op.create_index(
+        'ix_product_cards_category_created_at', 'product_cards', ['category', 'created_at', 'product_id']
+    )
+    op.create_index('ix_product_cards_category_price', 'product_cards', ['category', 'price', 'product_id'])
+
+    # 不在遷移中回填：啟動時 create_db_and_tables 偵測到空表會以現有商品資料重建
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_cards_category_price', table_name='product_cards')
+    op.drop_index('ix_product_cards_category_created_at', table_name='product_cards')
+    op.drop_index('ix_product_cards_price', table_name='product_cards')
+    op.drop_index('ix_product_cards_created_at', table_name='product_cards')
+    op.drop_table('product_cards')
@@ -0,0 +1,37 @@
+"""add product search n-gram index
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'product_search_grams',
+        sa.Column('gram', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('product_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('weight', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('gram', 'product_id'),
+    )
+    op.create_index(op.f('ix_product_search_grams_product_id'), 'product_search_grams', ['product_id'])
+
+    # 不在遷移中建立索引：啟動時 create_db_and_tables 偵測到空表會重建
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_search_grams_product_id'), table_name='product_search_grams')
+    op.drop_table('product_search_grams')
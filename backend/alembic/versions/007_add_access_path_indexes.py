@@ -0,0 +1,64 @@
+"""add composite and partial indexes for hot access paths
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18
+
+Indexes are built with CREATE INDEX CONCURRENTLY so catalog, cart and
+order writes keep flowing while they build. CONCURRENTLY cannot run in a
+transaction, hence the autocommit block.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    # (name, table, columns, postgresql_where)
+    ('ix_product_images_product_id_sort_order', 'product_images', ['product_id', 'sort_order'], None),
+    ('ix_product_images_main', 'product_images', ['product_id'], sa.text('is_main')),
+    ('ix_product_colors_product_id', 'product_colors', ['product_id'], None),
+    ('ix_product_sizes_product_id', 'product_sizes', ['product_id'], None),
+    ('ix_cart_items_line', 'cart_items', ['cart_id', 'product_id', 'color_id', 'size_id'], None),
+    ('ix_orders_user_id_created_at', 'orders', ['user_id', sa.text('created_at DESC')], None),
+    ('ix_order_items_order_id', 'order_items', ['order_id'], None),
+    ('ix_wishlist_items_user_id_created_at', 'wishlist_items', ['user_id', 'created_at'], None),
+]
+
+# Single-column indexes made redundant by the composites above
+SUPERSEDED = [
+    ('ix_orders_user_id', 'orders', ['user_id']),
+    ('ix_wishlist_items_user_id', 'wishlist_items', ['user_id']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=where,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        for name, table, _ in SUPERSEDED:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in SUPERSEDED:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
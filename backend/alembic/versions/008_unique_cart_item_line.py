@@ -0,0 +1,91 @@
+"""make cart lines unique per (cart, product, color, size)
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18
+
+Adding to the cart is now a single INSERT ... ON CONFLICT on the line
+tuple, which needs a unique index to arbitrate. Existing duplicate lines
+are folded into one (quantities summed, capped at 10) before the index is
+built concurrently; the unique index replaces ix_cart_items_line.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LINE_COLUMNS = ['cart_id', 'product_id', 'color_id', 'size_id']
+
+
+def upgrade() -> None:
+    # 合併重複的購物車品項：保留最早一筆，數量加總（上限 10）
+    op.execute("""
+        WITH ranked AS (
+            SELECT id,
+                   ROW_NUMBER() OVER w AS rn,
+                   LEAST(SUM(quantity) OVER w, 10) AS total
+            FROM cart_items
+            WINDOW w AS (
+                PARTITION BY cart_id, product_id, color_id, size_id
+                ORDER BY created_at, id
+                ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+            )
+        )
+        UPDATE cart_items SET quantity = ranked.total
+        FROM ranked
+        WHERE cart_items.id = ranked.id AND ranked.rn = 1
+          AND cart_items.quantity <> ranked.total
+    """)
+    op.execute("""
+        DELETE FROM cart_items WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY cart_id, product_id, color_id, size_id
+                    ORDER BY created_at, id
+                ) AS rn
+                FROM cart_items
+            ) ranked
+            WHERE rn > 1
+        )
+    """)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_cart_items_line',
+            'cart_items',
+            LINE_COLUMNS,
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_cart_items_line',
+            table_name='cart_items',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_cart_items_line',
+            'cart_items',
+            LINE_COLUMNS,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'uq_cart_items_line',
+            table_name='cart_items',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,69 @@
+"""add unlogged guest cart tables
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18
+
+Used when GUEST_CART_BACKEND = "unlogged". UNLOGGED tables skip the WAL,
+so guest cart churn produces no WAL or replication traffic; PostgreSQL
+truncates them after a crash and they are not present on replicas. Guest
+carts are moved into carts/cart_items at login and checkout, so user
+carts stay durable.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'guest_carts',
+        sa.Column('id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('session_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('session_id'),
+        prefixes=['UNLOGGED'],
+    )
+    op.create_index('ix_guest_carts_updated_at', 'guest_carts', ['updated_at'])
+
+    op.create_table(
+        'guest_cart_items',
+        sa.Column('id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('cart_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('product_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('color_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('size_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['cart_id'], ['guest_carts.id']),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('id'),
+        prefixes=['UNLOGGED'],
+    )
+    op.create_index(
+        'uq_guest_cart_items_line',
+        'guest_cart_items',
+        ['cart_id', 'product_id', 'color_id', 'size_id'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_guest_cart_items_line', table_name='guest_cart_items')
+    op.drop_table('guest_cart_items')
+    op.drop_index('ix_guest_carts_updated_at', table_name='guest_carts')
+    op.drop_table('guest_carts')
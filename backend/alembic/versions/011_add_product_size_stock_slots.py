@@ -0,0 +1,50 @@
+"""add sharded stock slots for product sizes
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 0 表示庫存只在 product_sizes.stock；大於 0 時結帳改扣分槽庫存
+    op.add_column(
+        'product_sizes',
+        sa.Column('stock_slots', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_table(
+        'product_size_stock_slots',
+        sa.Column('size_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('slot', sa.Integer(), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['size_id'], ['product_sizes.id']),
+        sa.PrimaryKeyConstraint('size_id', 'slot'),
+    )
+
+
+def downgrade() -> None:
+    # 先把分槽庫存併回 product_sizes.stock
+    op.execute(
+        """
+        UPDATE product_sizes SET stock = (
+            SELECT SUM(stock) FROM product_size_stock_slots
+            WHERE size_id = product_sizes.id
+        )
+        WHERE stock_slots > 0
+        """
+    )
+    op.drop_table('product_size_stock_slots')
+    op.drop_column('product_sizes', 'stock_slots')
@@ -0,0 +1,48 @@
+"""add checkout tickets for queued checkout
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '012'
+down_revision: Union[str, None] = '011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'checkout_tickets',
+        sa.Column('id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('session_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('user_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('request', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('order_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # worker 依建立時間取出排隊中的請求
+    op.create_index(
+        'ix_checkout_tickets_status_created_at',
+        'checkout_tickets',
+        ['status', 'created_at'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_checkout_tickets_status_created_at', table_name='checkout_tickets')
+    op.drop_table('checkout_tickets')
@@ -0,0 +1,29 @@
+"""add order number block sequence
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '013'
+down_revision: Union[str, None] = '012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 每次 nextval 為一個程序保留 100 個訂單編號（見 app/services/order_number.py）
+    op.execute(sa.schema.CreateSequence(
+        sa.Sequence('order_number_block_seq', increment=100)
+    ))
+
+
+def downgrade() -> None:
+    op.execute(sa.schema.DropSequence(sa.Sequence('order_number_block_seq')))
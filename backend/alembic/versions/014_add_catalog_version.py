@@ -0,0 +1,35 @@
+"""add catalog_version counter
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '014'
+down_revision: Union[str, None] = '013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    catalog_version = op.create_table(
+        'catalog_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # 只有一列，每次商品資料變更時遞增（見 app/db/projections.py）
+    op.bulk_insert(catalog_version, [{'id': 1, 'version': 1, 'updated_at': datetime.utcnow()}])
+
+
+def downgrade() -> None:
+    op.drop_table('catalog_version')
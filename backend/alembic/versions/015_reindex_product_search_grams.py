@@ -0,0 +1,26 @@
+"""reindex product search grams with bigrams and single characters
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '015'
+down_revision: Union[str, None] = '014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 分詞方式改變，清空舊索引；啟動時偵測到空表會以新的分詞重建
+    op.execute('DELETE FROM product_search_grams')
+
+
+def downgrade() -> None:
+    op.execute('DELETE FROM product_search_grams')
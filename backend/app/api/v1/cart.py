@@ -1,25 +1,53 @@
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends, Header, Request, Response
 from sqlmodel import Session
 
 from app.core.deps import get_current_user_optional, get_session_id
+from app.core.http import is_not_modified, not_modified, validator_headers
 from app.db.session import get_session
 from app.models.user import User
-from app.schemas import AddToCartRequest, CartResponse, UpdateCartItemRequest
-from app.services.cart_service import CartService
+from app.schemas import (
+    AddToCartRequest,
+    CartBatchRequest,
+    CartResponse,
+    CartSummaryResponse,
+    UpdateCartItemRequest,
+)
+from app.services.cart_service import CartService, cart_etag
 
 router = APIRouter()
 
 
 @router.get("", response_model=CartResponse)
 def get_cart(
+    request: Request,
+    response: Response,
     session_id: str = Depends(get_session_id),
     user: Optional[User] = Depends(get_current_user_optional),
     session: Session = Depends(get_session),
 ):
     service = CartService(session)
-    return service.get_cart(
+    owner = {
+        "session_id": session_id if not user else None,
+        "user_id": user.id if user else None,
+    }
+    cart = service.find_cart(**owner)
+    etag = service.get_etag(cart, user_id=owner["user_id"])
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers.update(validator_headers(etag))
+    return service.get_cart(**owner, cart=cart)
+
+
+@router.get("/summary", response_model=CartSummaryResponse)
+def get_cart_summary(
+    session_id: str = Depends(get_session_id),
+    user: Optional[User] = Depends(get_current_user_optional),
+    session: Session = Depends(get_session),
+):
+    service = CartService(session)
+    return service.get_summary(
         session_id=session_id if not user else None,
         user_id=user.id if user else None,
     )
@@ -28,58 +56,98 @@ def get_cart(
 @router.post("/items", response_model=CartResponse)
 def add_to_cart(
     request: AddToCartRequest,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     session_id: str = Depends(get_session_id),
     user: Optional[User] = Depends(get_current_user_optional),
     session: Session = Depends(get_session),
 ):
     service = CartService(session)
-    return service.add_item(
+    cart = service.add_item(
         request,
         session_id=session_id if not user else None,
         user_id=user.id if user else None,
+        if_match=if_match,
+    )
+    response.headers["ETag"] = cart_etag(cart)
+    return cart
+
+
+@router.post("/batch", response_model=CartResponse)
+def apply_cart_operations(
+    request: CartBatchRequest,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    session_id: str = Depends(get_session_id),
+    user: Optional[User] = Depends(get_current_user_optional),
+    session: Session = Depends(get_session),
+):
+    service = CartService(session)
+    cart = service.apply_operations(
+        request.operations,
+        session_id=session_id if not user else None,
+        user_id=user.id if user else None,
+        if_match=if_match,
     )
+    response.headers["ETag"] = cart_etag(cart)
+    return cart
 
 
 @router.put("/items/{item_id}", response_model=CartResponse)
 def update_cart_item(
     item_id: str,
     request: UpdateCartItemRequest,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     session_id: str = Depends(get_session_id),
     user: Optional[User] = Depends(get_current_user_optional),
     session: Session = Depends(get_session),
 ):
     service = CartService(session)
-    return service.update_item(
+    cart = service.update_item(
         item_id,
         request.quantity,
         session_id=session_id if not user else None,
         user_id=user.id if user else None,
+        if_match=if_match,
     )
+    response.headers["ETag"] = cart_etag(cart)
+    return cart
 
 
 @router.delete("/items/{item_id}", response_model=CartResponse)
 def remove_cart_item(
     item_id: str,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     session_id: str = Depends(get_session_id),
     user: Optional[User] = Depends(get_current_user_optional),
     session: Session = Depends(get_session),
 ):
     service = CartService(session)
-    return service.remove_item(
+    cart = service.remove_item(
         item_id,
         session_id=session_id if not user else None,
         user_id=user.id if user else None,
+        if_match=if_match,
     )
+    response.headers["ETag"] = cart_etag(cart)
+    return cart
 
 
 @router.delete("", response_model=CartResponse)
 def clear_cart(
+    response: Response,
+    if_match: Optional[str] = Header(None),
     session_id: str = Depends(get_session_id),
     user: Optional[User] = Depends(get_current_user_optional),
     session: Session = Depends(get_session),
 ):
     service = CartService(session)
-    return service.clear_cart(
+    cart = service.clear_cart(
         session_id=session_id if not user else None,
         user_id=user.id if user else None,
+        if_match=if_match,
     )
+    response.headers["ETag"] = cart_etag(cart)
+    return cart
@@ -1,12 +1,18 @@
 from typing import Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, status
 from sqlmodel import Session
 
 from app.core.deps import get_current_user_optional, get_current_user_required, get_session_id
 from app.db.session import get_session
 from app.models.user import User
-from app.schemas.order import CreateOrderRequest, OrderResponse, OrderListItem
+from app.schemas.order import (
+    CheckoutModeResponse,
+    CheckoutTicketResponse,
+    CreateOrderRequest,
+    OrderListItem,
+    OrderResponse,
+)
 from app.services.order_service import OrderService
 
 router = APIRouter()
@@ -27,6 +33,49 @@ def create_order(
     )
 
 
+@router.get("/checkout-mode", response_model=CheckoutModeResponse)
+def get_checkout_mode(
+    user: Optional[User] = Depends(get_current_user_optional),
+    session: Session = Depends(get_session),
+):
+    service = OrderService(session)
+    return CheckoutModeResponse(queue=service.queue_available(user.id if user else None))
+
+
+@router.post(
+    "/queue",
+    response_model=CheckoutTicketResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def enqueue_order(
+    request: CreateOrderRequest,
+    session_id: str = Depends(get_session_id),
+    user: Optional[User] = Depends(get_current_user_optional),
+    session: Session = Depends(get_session),
+):
+    service = OrderService(session)
+    return service.enqueue_order(
+        request,
+        session_id=session_id if not user else None,
+        user_id=user.id if user else None,
+    )
+
+
+@router.get("/tickets/{ticket_id}", response_model=CheckoutTicketResponse)
+def get_ticket(
+    ticket_id: str,
+    session_id: str = Depends(get_session_id),
+    user: Optional[User] = Depends(get_current_user_optional),
+    session: Session = Depends(get_session),
+):
+    service = OrderService(session)
+    return service.get_ticket(
+        ticket_id,
+        session_id=session_id if not user else None,
+        user_id=user.id if user else None,
+    )
+
+
 @router.get("", response_model=list[OrderListItem])
 def get_orders(
     user: User = Depends(get_current_user_required),
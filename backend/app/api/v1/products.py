@@ -1,38 +1,111 @@
-from fastapi import APIRouter, Depends, Query
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlmodel import Session
+from app.core.config import settings
+from app.core.exceptions import ProductNotFoundError
+from app.core.http import make_etag, is_not_modified, not_modified, validator_headers
 from app.db.session import get_session
 from app.services.product_service import ProductService
-from app.schemas import ProductResponse, ProductListItemResponse
+from app.schemas import (
+    ProductBatchRequest,
+    ProductFacetsResponse,
+    ProductListItemResponse,
+    ProductResponse,
+)
 
 router = APIRouter()
 
 
 @router.get("", response_model=dict)
 def get_products(
+    request: Request,
+    response: Response,
     category: str | None = Query(None),
     search: str | None = Query(None),
     sort: str | None = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(24, ge=1, le=100),
+    paging: Literal["offset", "cursor"] = Query("offset"),
+    cursor: str | None = Query(None),
     session: Session = Depends(get_session),
 ):
     service = ProductService(session)
-    products, total = service.get_products(category, page, page_size, search=search, sort=sort)
+
+    last_modified, catalog_version = service.get_catalog_version()
+    etag = make_etag("products", catalog_version, request.url.query)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    response.headers.update(validator_headers(etag, last_modified))
+
+    if paging == "cursor" or cursor:
+        products, next_cursor = service.get_products_by_cursor(
+            category, page_size, search=search, sort=sort, cursor=cursor
+        )
+        return {
+            "data": products,
+            "nextCursor": next_cursor,
+            "pageSize": page_size,
+        }
+
+    count_cap = settings.PRODUCT_COUNT_CAP
+    products, total = service.get_products(
+        category, page, page_size, search=search, sort=sort, count_cap=count_cap
+    )
+    total_capped = count_cap is not None and total > count_cap
+    if total_capped:
+        total = count_cap
     total_pages = (total + page_size - 1) // page_size
 
     return {
         "data": products,
         "total": total,
+        "totalCapped": total_capped,
         "page": page,
         "pageSize": page_size,
         "totalPages": total_pages,
     }
 
 
+@router.get("/facets", response_model=ProductFacetsResponse)
+def get_product_facets(
+    category: str | None = Query(None),
+    search: str | None = Query(None),
+    session: Session = Depends(get_session),
+):
+    service = ProductService(session)
+    return service.get_facets(category, search=search)
+
+
+@router.post("/batch", response_model=dict)
+def get_products_batch(
+    request: ProductBatchRequest,
+    session: Session = Depends(get_session),
+):
+    service = ProductService(session)
+    return {"data": service.get_products_batch(request.ids, request.slugs)}
+
+
 @router.get("/{slug}", response_model=ProductResponse)
 def get_product(
     slug: str,
+    request: Request,
     session: Session = Depends(get_session),
 ):
     service = ProductService(session)
-    return service.get_product_by_slug(slug)
+
+    version = service.get_product_version(slug)
+    if not version:
+        raise ProductNotFoundError()
+
+    product_id, last_modified = version
+    etag = make_etag("product", product_id, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    # Pre-encoded body: skips response_model validation and serialization
+    return Response(
+        content=service.get_product_json(product_id, last_modified),
+        media_type="application/json",
+        headers=validator_headers(etag, last_modified),
+    )
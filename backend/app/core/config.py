@@ -16,6 +16,41 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
 
+    # Catalog
+    # Stop counting listing totals after this many rows (None = exact count)
+    PRODUCT_COUNT_CAP: int | None = None
+    PRODUCT_FACET_PRICE_BUCKET: int = 1000
+    PRODUCT_FACET_CACHE_TTL: int = 60
+    PRODUCT_BATCH_MAX: int = 50
+    PRODUCT_DETAIL_CACHE_BYTES: int = 32 * 1024 * 1024
+
+    # Cart
+    CART_TTL_DAYS: int = 30
+    CART_GC_BATCH_SIZE: int = 500
+    # Run the abandoned cart cleanup in-process every N minutes (0 = off)
+    CART_GC_INTERVAL_MINUTES: int = 0
+    CART_BATCH_MAX: int = 50
+    CART_SUMMARY_CACHE_TTL: int = 30
+    # Where guest carts live: "sql" (cart tables), "unlogged" (UNLOGGED
+    # guest_carts tables, PostgreSQL) or "memory" (per process, single worker
+    # only). The last two are written to the cart tables at login/checkout.
+    GUEST_CART_BACKEND: str = "sql"
+    GUEST_CART_MEMORY_MAX: int = 100_000
+
+    # Inventory
+    # Fold sharded stock slots back into product_sizes.stock every N seconds
+    # (0 = off; run `python -m app.jobs.stock_shards reconcile` instead)
+    STOCK_RECONCILE_INTERVAL_SECONDS: int = 0
+
+    # Queued checkout (POST /orders/queue)
+    # Tickets are admitted by `python -m app.jobs.checkout_worker`. Turn
+    # CHECKOUT_QUEUE_ENABLED on once that worker runs, or set
+    # CHECKOUT_QUEUE_WORKERS above 0 to run workers inside each API process;
+    # otherwise clients check out synchronously.
+    CHECKOUT_QUEUE_ENABLED: bool = False
+    CHECKOUT_QUEUE_WORKERS: int = 0
+    CHECKOUT_QUEUE_POLL_SECONDS: float = 0.5
+
     # CORS
     BACKEND_CORS_ORIGINS: list[str] = ["http://localhost:5173", "http://localhost:3000"]
 
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from fastapi import Depends, Header, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Response, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlmodel import Session, select
 from uuid import uuid4
@@ -14,8 +14,15 @@ from app.models.user import User
 optional_bearer = HTTPBearer(auto_error=False)
 
 
-def get_session_id(x_session_id: str | None = Header(None)) -> str:
-    return x_session_id or str(uuid4())
+def get_session_id(
+    response: Response, x_session_id: str | None = Header(None)
+) -> str:
+    """Anonymous session id; new visitors are issued one via the X-Session-Id header."""
+    if x_session_id:
+        return x_session_id
+    session_id = str(uuid4())
+    response.headers["X-Session-Id"] = session_id
+    return session_id
 
 
 def get_current_user_optional(
@@ -16,6 +16,16 @@ class OutOfStockError(HTTPException):
         super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
 
 
+class InsufficientStockError(HTTPException):
+    def __init__(self, detail: str = "Insufficient stock"):
+        super().__init__(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+
+class PreconditionFailedError(HTTPException):
+    def __init__(self, detail: str = "Resource has been modified"):
+        super().__init__(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=detail)
+
+
 class CartItemNotFoundError(NotFoundError):
     def __init__(self):
         super().__init__(detail="Cart item not found")
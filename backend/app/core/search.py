@@ -0,0 +1,61 @@
+"""N-gram tokenizer for the product search index.
+
+CJK text has no word boundaries, so CJK runs are indexed as single
+characters and overlapping bigrams. Other scripts are split into words and
+indexed as single characters, bigrams and trigrams. A query word becomes its
+trigrams, or the word itself when it is shorter than a trigram, so "ir"
+finds "Air" through the index. A query matches a product when every gram of
+the query is present in the product's index.
+"""
+import re
+import unicodedata
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(rf"([{_CJK}]+)|([^\W_{_CJK}]+)")
+
+# Field weights used for relevance ranking
+NAME_WEIGHT = 3
+SUBTITLE_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def _ngrams(token: str, n: int) -> set[str]:
+    if len(token) <= n:
+        return {token}
+    return {token[i:i + n] for i in range(len(token) - n + 1)}
+
+
+def document_grams(text: str) -> set[str]:
+    grams: set[str] = set()
+    for cjk, word in _TOKEN_RE.findall(_normalize(text)):
+        if cjk:
+            grams.update(cjk)
+            grams.update(_ngrams(cjk, 2))
+        else:
+            for n in (1, 2, 3):
+                grams.update(_ngrams(word, n))
+    return grams
+
+
+def query_grams(text: str) -> set[str]:
+    grams: set[str] = set()
+    for cjk, word in _TOKEN_RE.findall(_normalize(text)):
+        grams.update(_ngrams(cjk, 2) if cjk else _ngrams(word, 3))
+    return grams
+
+
+def weighted_grams(name: str, subtitle: str, description: str) -> dict[str, int]:
+    """Map each gram of a product to the weight of the best field containing it."""
+    weights: dict[str, int] = {}
+    for text, weight in (
+        (description, DESCRIPTION_WEIGHT),
+        (subtitle, SUBTITLE_WEIGHT),
+        (name, NAME_WEIGHT),
+    ):
+        for gram in document_grams(text):
+            weights[gram] = weight
+    return weights
@@ -0,0 +1,257 @@
+"""Read models derived from the catalog tables.
+
+``product_cards`` holds one narrow row per product for listing pages and
+``product_search_grams`` is the search index. Both are rebuilt for the
+affected products whenever a product, image, color or size is flushed
+through an ORM session. Code that changes catalog rows with bulk
+statements (bypassing the ORM) must call :func:`touch_products` itself, or
+:func:`touch_stock` when only stock changed. Each refresh that can change
+the list also bumps the single ``catalog_version`` row, which versions the
+product list without scanning the cards.
+
+In-process caches register with :func:`on_catalog_change` and are told which
+products changed once the transaction commits. They choose the kinds of
+change they depend on: ``"catalog"`` (anything but stock), ``"price"`` (a
+product's price, or a product added or removed) and ``"stock"``.
+"""
+from collections.abc import Callable, Iterable
+from datetime import datetime
+
+from sqlalchemy import Connection, delete, event, exists, func, insert, inspect, literal, select, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session
+
+from app.core.search import weighted_grams
+from app.models import (
+    CatalogVersion,
+    Product,
+    ProductCard,
+    ProductColor,
+    ProductImage,
+    ProductSearchGram,
+    ProductSize,
+)
+
+_CHANGED_KEY = "changed_product_ids"
+CHANGE_KINDS = ("catalog", "price", "stock")
+_catalog_listeners: list[tuple[Callable[[set[str]], None], frozenset[str]]] = []
+
+
+def on_catalog_change(
+    listener: Callable[[set[str]], None], kinds: Iterable[str] = CHANGE_KINDS
+) -> None:
+    """Call ``listener(product_ids)`` after each commit with a change of ``kinds``.
+
+    ``product_ids`` are the products with a change of one of those kinds.
+    """
+    _catalog_listeners.append((listener, frozenset(kinds)))
+
+
+def _record_change(session: Session, kind: str, product_ids: Iterable[str]) -> None:
+    changed = session.info.setdefault(_CHANGED_KEY, {})
+    changed.setdefault(kind, set()).update(product_ids)
+
+
+def main_image_url_column():
+    """The is_main image, falling back to the first image by sort_order."""
+    url = (
+        select(ProductImage.url)
+        .where(ProductImage.product_id == Product.id)
+        .order_by(ProductImage.is_main.desc(), ProductImage.sort_order)
+        .limit(1)
+        .scalar_subquery()
+    )
+    return func.coalesce(url, "")
+
+
+def card_in_stock_column(product_id):
+    return exists().where(ProductSize.product_id == product_id, ProductSize.stock > 0)
+
+
+def refresh_product_cards(
+    connection: Connection, product_ids: Iterable[str] | None = None
+) -> None:
+    """Rebuild the cards of ``product_ids`` (all products when None).
+
+    Cards are upserted, so concurrent refreshes of the same product do not
+    collide on the primary key.
+    """
+    color_count = (
+        select(func.count(ProductColor.id))
+        .where(ProductColor.product_id == Product.id)
+        .scalar_subquery()
+    )
+    # SQLite needs a WHERE to tell the SELECT from the ON CONFLICT clause
+    source = select(
+        Product.id,
+        Product.slug,
+        Product.name,
+        Product.subtitle,
+        Product.price,
+        Product.original_price,
+        Product.category,
+        main_image_url_column(),
+        color_count,
+        card_in_stock_column(Product.id),
+        Product.created_at,
+        literal(datetime.utcnow()),
+    ).where(true())
+    removed = delete(ProductCard).where(
+        ~exists().where(Product.id == ProductCard.product_id)
+    )
+
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        source = source.where(Product.id.in_(product_ids))
+        removed = removed.where(ProductCard.product_id.in_(product_ids))
+
+    columns = [
+        "product_id",
+        "slug",
+        "name",
+        "subtitle",
+        "price",
+        "original_price",
+        "category",
+        "main_image_url",
+        "color_count",
+        "in_stock",
+        "created_at",
+        "refreshed_at",
+    ]
+    upsert = pg_insert(ProductCard).from_select(columns, source)
+    connection.execute(removed)
+    connection.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[ProductCard.product_id],
+            set_={column: upsert.excluded[column] for column in columns[1:]},
+        )
+    )
+
+
+def refresh_search_grams(
+    connection: Connection, product_ids: Iterable[str] | None = None
+) -> None:
+    """Re-index ``product_ids`` for search (all products when None)."""
+    source = select(Product.id, Product.name, Product.subtitle, Product.description)
+    clear = delete(ProductSearchGram)
+
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        source = source.where(Product.id.in_(product_ids))
+        clear = clear.where(ProductSearchGram.product_id.in_(product_ids))
+
+    connection.execute(clear)
+    rows = [
+        {"gram": gram, "product_id": product_id, "weight": weight}
+        for product_id, name, subtitle, description in connection.execute(source)
+        for gram, weight in weighted_grams(name, subtitle, description).items()
+    ]
+    if rows:
+        # A concurrent re-index of the same product may have inserted first
+        upsert = pg_insert(ProductSearchGram)
+        connection.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[ProductSearchGram.gram, ProductSearchGram.product_id],
+                set_={"weight": upsert.excluded.weight},
+            ),
+            rows,
+        )
+
+
+def bump_catalog_version(connection: Connection) -> None:
+    now = datetime.utcnow()
+    bumped = connection.execute(
+        update(CatalogVersion).values(version=CatalogVersion.version + 1, updated_at=now)
+    )
+    if not bumped.rowcount:
+        connection.execute(insert(CatalogVersion).values(id=1, version=1, updated_at=now))
+
+
+def touch_products(
+    session: Session, product_ids: Iterable[str], price_changed: bool = True
+) -> None:
+    """Refresh derived catalog rows after a change the ORM did not see.
+
+    Pass ``price_changed=False`` when no product's price can have changed.
+    """
+    product_ids = list(product_ids)
+    connection = session.connection()
+    refresh_product_cards(connection, product_ids)
+    refresh_search_grams(connection, product_ids)
+    bump_catalog_version(connection)
+    _record_change(session, "catalog", product_ids)
+    if price_changed:
+        _record_change(session, "price", product_ids)
+
+
+def touch_stock(session: Session, product_ids: Iterable[str]) -> None:
+    """Refresh the cards of ``product_ids`` after a change to their stock only.
+
+    Only in_stock and refreshed_at are updated and the search index is left
+    alone. The catalog version moves only when a product sold out or came
+    back in stock, since nothing else on the list depends on stock.
+    """
+    product_ids = sorted(product_ids)
+    if not product_ids:
+        return
+    connection = session.connection()
+    now = datetime.utcnow()
+    in_stock = card_in_stock_column(ProductCard.product_id)
+    cards = ProductCard.product_id.in_(product_ids)
+    flipped = connection.execute(
+        update(ProductCard)
+        .where(cards, ProductCard.in_stock != in_stock)
+        .values(in_stock=in_stock, refreshed_at=now)
+        .returning(ProductCard.product_id)
+    ).all()
+    if len(flipped) < len(product_ids):
+        connection.execute(
+            update(ProductCard).where(cards).values(refreshed_at=now)
+        )
+    if flipped:
+        bump_catalog_version(connection)
+    _record_change(session, "stock", product_ids)
+
+
+def _changed_product_ids(session: Session) -> tuple[set[str], set[str]]:
+    """Products touched by the flush, and those whose price changed."""
+    product_ids: set[str] = set()
+    repriced: set[str] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Product):
+            product_ids.add(obj.id)
+            if obj not in session.dirty or inspect(obj).attrs.price.history.has_changes():
+                repriced.add(obj.id)
+        elif isinstance(obj, (ProductImage, ProductColor, ProductSize)):
+            product_ids.add(obj.product_id)
+    return product_ids, repriced
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_after_flush(session: Session, flush_context) -> None:
+    # new/dirty/deleted still describe what this flush wrote
+    product_ids, repriced = _changed_product_ids(session)
+    if product_ids:
+        touch_products(session, product_ids, price_changed=False)
+        _record_change(session, "price", repriced)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_after_commit(session: Session) -> None:
+    changed = session.info.pop(_CHANGED_KEY, None)
+    if not changed:
+        return
+    for listener, kinds in _catalog_listeners:
+        product_ids = set().union(*(changed.get(kind, ()) for kind in kinds))
+        if product_ids:
+            listener(product_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_CHANGED_KEY, None)
@@ -1,9 +1,36 @@
 from sqlmodel import SQLModel, Session, create_engine
 from sqlalchemy import inspect, text
 from app.core.config import settings
+from app.db.projections import refresh_product_cards, refresh_search_grams
 
 engine = create_engine(settings.DATABASE_URL, echo=False)
 
+# Keep the first row of each (cart, product, color, size) line, carrying the
+# summed quantity capped at 10, and drop the rest
+MERGE_DUPLICATE_CART_LINES = (
+    """
+    UPDATE cart_items SET quantity = (
+        SELECT CASE WHEN SUM(d.quantity) > 10 THEN 10 ELSE SUM(d.quantity) END
+        FROM cart_items d
+        WHERE d.cart_id = cart_items.cart_id
+          AND d.product_id = cart_items.product_id
+          AND d.color_id = cart_items.color_id
+          AND d.size_id = cart_items.size_id
+    )
+    WHERE id IN (
+        SELECT MIN(id) FROM cart_items
+        GROUP BY cart_id, product_id, color_id, size_id
+        HAVING COUNT(*) > 1
+    )
+    """,
+    """
+    DELETE FROM cart_items WHERE id NOT IN (
+        SELECT MIN(id) FROM cart_items
+        GROUP BY cart_id, product_id, color_id, size_id
+    )
+    """,
+)
+
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
@@ -14,6 +41,24 @@ def _apply_schema_updates():
     """Apply schema updates for existing tables that create_all won't handle."""
     inspector = inspect(engine)
 
+    # create_all skips indexes of tables that already exist. Secondary
+    # indexes come from the Alembic migrations, which build them without
+    # blocking writes; only the index cart upserts depend on is built here.
+    if "cart_items" in inspector.get_table_names():
+        indexes = [i["name"] for i in inspector.get_indexes("cart_items")]
+        if "uq_cart_items_line" not in indexes:
+            # Fold duplicate lines so the unique index can be built
+            with engine.begin() as conn:
+                for statement in MERGE_DUPLICATE_CART_LINES:
+                    conn.execute(text(statement))
+            concurrently = "CONCURRENTLY " if engine.dialect.name == "postgresql" else ""
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(
+                    f"CREATE UNIQUE INDEX {concurrently}IF NOT EXISTS uq_cart_items_line "
+                    "ON cart_items (cart_id, product_id, color_id, size_id)"
+                ))
+                conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS ix_cart_items_line"))
+
     if "carts" in inspector.get_table_names():
         columns = [c["name"] for c in inspector.get_columns("carts")]
         if "user_id" not in columns:
@@ -27,6 +72,28 @@ def _apply_schema_updates():
                 conn.execute(text(
                     "ALTER TABLE carts ALTER COLUMN session_id DROP NOT NULL"
                 ))
+        if "version" not in columns:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "ALTER TABLE carts ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+                ))
+
+    for table, refresh in (
+        ("product_cards", refresh_product_cards),
+        ("product_search_grams", refresh_search_grams),
+    ):
+        if table in inspector.get_table_names():
+            with engine.begin() as conn:
+                if conn.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first() is None:
+                    refresh(conn)
+
+    if "product_sizes" in inspector.get_table_names():
+        columns = [c["name"] for c in inspector.get_columns("product_sizes")]
+        if "stock_slots" not in columns:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "ALTER TABLE product_sizes ADD COLUMN stock_slots INTEGER NOT NULL DEFAULT 0"
+                ))
 
     if "order_items" in inspector.get_table_names():
         columns = [c["name"] for c in inspector.get_columns("order_items")]
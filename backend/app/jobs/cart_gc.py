@@ -0,0 +1,100 @@
+"""Delete anonymous carts that have been idle longer than the cart TTL.
+
+Runs in-process when CART_GC_INTERVAL_MINUTES > 0, or once from the CLI:
+
+    python -m app.jobs.cart_gc [--ttl-days 30] [--batch-size 500]
+"""
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, delete, select
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models import Cart, CartItem, GuestCart, GuestCartItem
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CartGCResult:
+    carts: int = 0
+    items: int = 0
+
+
+def purge_abandoned_carts(
+    session: Session, ttl: timedelta, batch_size: int
+) -> CartGCResult:
+    """Delete idle anonymous carts ``batch_size`` at a time, one transaction per batch.
+
+    Covers guest carts in the cart tables and in the unlogged guest tables.
+    """
+    cutoff = datetime.utcnow() - ttl
+    result = CartGCResult()
+    for cart_model, item_model, idle in (
+        (Cart, CartItem, Cart.user_id.is_(None) & (Cart.updated_at < cutoff)),
+        (GuestCart, GuestCartItem, GuestCart.updated_at < cutoff),
+    ):
+        _purge(session, cart_model, item_model, idle, batch_size, result)
+    return result
+
+
+def _purge(session, cart_model, item_model, idle, batch_size, result) -> None:
+    while True:
+        # SKIP LOCKED leaves carts that a request is writing right now alone
+        cart_ids = session.exec(
+            select(cart_model.id)
+            .where(idle)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not cart_ids:
+            break
+
+        result.items += session.exec(
+            delete(item_model).where(item_model.cart_id.in_(cart_ids))
+        ).rowcount
+        result.carts += session.exec(
+            delete(cart_model).where(cart_model.id.in_(cart_ids))
+        ).rowcount
+        session.commit()
+
+
+def run_once(ttl_days: int | None = None, batch_size: int | None = None) -> CartGCResult:
+    if ttl_days is None:
+        ttl_days = settings.CART_TTL_DAYS
+    if batch_size is None:
+        batch_size = settings.CART_GC_BATCH_SIZE
+
+    with Session(engine) as session:
+        result = purge_abandoned_carts(
+            session, ttl=timedelta(days=ttl_days), batch_size=batch_size
+        )
+    logger.info("Cart GC deleted %d carts and %d cart items", result.carts, result.items)
+    return result
+
+
+async def run_periodically(interval_minutes: int) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(run_once)
+        except Exception:
+            logger.exception("Cart GC failed")
+        await asyncio.sleep(interval_minutes * 60)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Delete abandoned anonymous carts")
+    parser.add_argument("--ttl-days", type=int, default=settings.CART_TTL_DAYS)
+    parser.add_argument("--batch-size", type=int, default=settings.CART_GC_BATCH_SIZE)
+    args = parser.parse_args()
+
+    result = run_once(ttl_days=args.ttl_days, batch_size=args.batch_size)
+    print(f"Deleted {result.carts} carts and {result.items} cart items")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Admit queued checkout tickets into orders, oldest first.
+
+Run it as a dedicated consumer next to the API processes:
+
+    python -m app.jobs.checkout_worker [--workers 2] [--poll-seconds 0.5]
+
+or in-process by setting CHECKOUT_QUEUE_WORKERS above 0.
+
+A ticket is claimed with FOR UPDATE SKIP LOCKED and marked completed or
+failed in the same transaction that claimed it, so workers never admit a
+ticket twice and a worker that dies mid-checkout leaves its ticket queued.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlmodel import Session, select, update
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models import CheckoutTicket
+from app.schemas.order import CreateOrderRequest
+from app.services.order_service import OrderService
+
+logger = logging.getLogger(__name__)
+
+
+def process_next_ticket(session: Session) -> bool:
+    """Admit the oldest queued ticket; returns False when the queue is empty."""
+    oldest = (
+        select(CheckoutTicket.id)
+        .where(CheckoutTicket.status == "queued")
+        .order_by(CheckoutTicket.created_at, CheckoutTicket.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    # Claim with a write, so the ticket stays locked until the order commits
+    claimed = session.exec(
+        update(CheckoutTicket)
+        .where(CheckoutTicket.id == oldest, CheckoutTicket.status == "queued")
+        .values(updated_at=datetime.utcnow())
+        .returning(
+            CheckoutTicket.id,
+            CheckoutTicket.session_id,
+            CheckoutTicket.user_id,
+            CheckoutTicket.request,
+        )
+        .execution_options(synchronize_session=False)
+    ).first()
+    if not claimed:
+        session.rollback()
+        return False
+
+    ticket_id, session_id, user_id, request = claimed
+    try:
+        # A failed checkout rolls back to here and keeps the ticket claimed
+        with session.begin_nested():
+            order = OrderService(session).place_order(
+                CreateOrderRequest.model_validate_json(request),
+                session_id=session_id,
+                user_id=user_id,
+            )
+        session.exec(
+            update(CheckoutTicket)
+            .where(CheckoutTicket.id == ticket_id)
+            .values(status="completed", order_id=order.id, updated_at=datetime.utcnow())
+        )
+        session.commit()
+    except HTTPException as exc:
+        _fail(session, ticket_id, str(exc.detail))
+    except Exception:
+        logger.exception("Checkout ticket %s failed", ticket_id)
+        # The transaction may be unusable, which also releases the claim
+        session.rollback()
+        _fail(session, ticket_id, "結帳失敗，請稍後再試")
+    return True
+
+
+def _fail(session: Session, ticket_id: str, error: str) -> None:
+    # Leave the ticket alone if the claim was lost and another worker has
+    # admitted it since
+    session.exec(
+        update(CheckoutTicket)
+        .where(CheckoutTicket.id == ticket_id, CheckoutTicket.status == "queued")
+        .values(status="failed", error=error, updated_at=datetime.utcnow())
+    )
+    session.commit()
+
+
+def run_once() -> bool:
+    with Session(engine) as session:
+        return process_next_ticket(session)
+
+
+async def run_workers(workers: int, poll_seconds: float) -> None:
+    async def worker() -> None:
+        while True:
+            try:
+                processed = await asyncio.to_thread(run_once)
+            except Exception:
+                logger.exception("Checkout worker failed")
+                processed = False
+            if not processed:
+                await asyncio.sleep(poll_seconds)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Admit queued checkouts into orders")
+    parser.add_argument("--workers", type=int, default=max(settings.CHECKOUT_QUEUE_WORKERS, 2))
+    parser.add_argument("--poll-seconds", type=float, default=settings.CHECKOUT_QUEUE_POLL_SECONDS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run_workers(args.workers, args.poll_seconds))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Split a hot size's stock across counter slots, and fold the slots back.
+
+While a size is sharded, checkout takes its units from one of its
+product_size_stock_slots rows instead of the single product_sizes row, so
+buyers of a flash-sale item do not all queue on one row lock.
+product_sizes.stock then lags behind and is brought up to date by the
+reconciliation, in-process when STOCK_RECONCILE_INTERVAL_SECONDS > 0 or from
+the CLI:
+
+    python -m app.jobs.stock_shards shard <size_id> [--slots 16]
+    python -m app.jobs.stock_shards unshard <size_id>
+    python -m app.jobs.stock_shards reconcile
+
+Unshard a size before changing its stock: reconciliation overwrites
+product_sizes.stock with the sum of the slots.
+"""
+import argparse
+import asyncio
+import logging
+
+from sqlmodel import Session, delete, func, select, update
+
+from app.core.config import settings
+from app.db.projections import touch_stock
+from app.db.session import engine
+from app.models import ProductSize, ProductSizeStockSlot
+
+logger = logging.getLogger(__name__)
+
+
+def shard_stock(session: Session, size_id: str, slots: int) -> int:
+    """Split the size's stock evenly across ``slots`` counters.
+
+    Re-sharding an already sharded size folds its slots first. Returns the
+    stock that was split.
+    """
+    if slots < 1:
+        raise ValueError("A sharded size needs at least one slot")
+    size = _lock_size(session, size_id)
+    if size.stock_slots:
+        _fold(session, size)
+
+    stock = max(size.stock, 0)
+    per_slot, remainder = divmod(stock, slots)
+    session.add_all(
+        ProductSizeStockSlot(
+            size_id=size.id, slot=slot, stock=per_slot + (1 if slot < remainder else 0)
+        )
+        for slot in range(slots)
+    )
+    size.stock_slots = slots
+    session.commit()
+    return stock
+
+
+def unshard_stock(session: Session, size_id: str) -> int:
+    """Fold the size's slots back into product_sizes.stock; returns the stock.
+
+    Checkouts racing with this may be refused for insufficient stock, so
+    unshard once the sale is over.
+    """
+    size = _lock_size(session, size_id)
+    if size.stock_slots:
+        _fold(session, size)
+    session.commit()
+    return size.stock
+
+
+def reconcile_stock(session: Session) -> int:
+    """Set the stock of each sharded size to the sum of its slots.
+
+    Returns the number of sizes whose stock changed.
+    """
+    slot_total = (
+        select(func.coalesce(func.sum(ProductSizeStockSlot.stock), 0))
+        .where(ProductSizeStockSlot.size_id == ProductSize.id)
+        .scalar_subquery()
+    )
+    product_ids = session.exec(
+        update(ProductSize)
+        .where(ProductSize.stock_slots > 0, ProductSize.stock != slot_total)
+        .values(stock=slot_total)
+        .returning(ProductSize.product_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if product_ids:
+        touch_stock(session, set(product_ids))
+    session.commit()
+    return len(product_ids)
+
+
+def _lock_size(session: Session, size_id: str) -> ProductSize:
+    size = session.exec(
+        select(ProductSize).where(ProductSize.id == size_id).with_for_update()
+    ).first()
+    if not size:
+        raise ValueError(f"Product size {size_id} not found")
+    return size
+
+
+def _fold(session: Session, size: ProductSize) -> None:
+    # Waits for checkouts holding a slot, then sees their committed stock
+    stocks = session.exec(
+        select(ProductSizeStockSlot.stock)
+        .where(ProductSizeStockSlot.size_id == size.id)
+        .with_for_update()
+    ).all()
+    session.exec(
+        delete(ProductSizeStockSlot).where(ProductSizeStockSlot.size_id == size.id)
+    )
+    size.stock = sum(stocks)
+    size.stock_slots = 0
+    session.flush()
+
+
+def run_once() -> int:
+    with Session(engine) as session:
+        changed = reconcile_stock(session)
+    if changed:
+        logger.info("Stock reconciliation updated %d sharded sizes", changed)
+    return changed
+
+
+async def run_periodically(interval_seconds: int) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(run_once)
+        except Exception:
+            logger.exception("Stock reconciliation failed")
+        await asyncio.sleep(interval_seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage sharded stock counters")
+    commands = parser.add_subparsers(dest="command", required=True)
+    shard = commands.add_parser("shard", help="split a size's stock across slots")
+    shard.add_argument("size_id")
+    shard.add_argument("--slots", type=int, default=16)
+    unshard = commands.add_parser("unshard", help="fold a size's slots back")
+    unshard.add_argument("size_id")
+    commands.add_parser("reconcile", help="update the stock of sharded sizes")
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        try:
+            if args.command == "shard":
+                stock = shard_stock(session, args.size_id, args.slots)
+                print(f"Split {stock} units of {args.size_id} across {args.slots} slots")
+            elif args.command == "unshard":
+                stock = unshard_stock(session, args.size_id)
+                print(f"Folded {args.size_id} back into one counter with {stock} units")
+            else:
+                print(f"Updated the stock of {reconcile_stock(session)} sharded sizes")
+        except ValueError as exc:
+            parser.error(str(exc))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -12,8 +14,35 @@ async def lifespan(app: FastAPI):
     create_db_and_tables()
     from app.db.seed import seed_data
     seed_data()
+
+    background_tasks = []
+    if settings.CART_GC_INTERVAL_MINUTES > 0:
+        from app.jobs.cart_gc import run_periodically
+        background_tasks.append(
+            asyncio.create_task(run_periodically(settings.CART_GC_INTERVAL_MINUTES))
+        )
+    if settings.STOCK_RECONCILE_INTERVAL_SECONDS > 0:
+        from app.jobs.stock_shards import run_periodically as reconcile_periodically
+        background_tasks.append(
+            asyncio.create_task(
+                reconcile_periodically(settings.STOCK_RECONCILE_INTERVAL_SECONDS)
+            )
+        )
+
+    if settings.CHECKOUT_QUEUE_WORKERS > 0:
+        from app.jobs.checkout_worker import run_workers
+        background_tasks.append(
+            asyncio.create_task(
+                run_workers(
+                    settings.CHECKOUT_QUEUE_WORKERS, settings.CHECKOUT_QUEUE_POLL_SECONDS
+                )
+            )
+        )
+
     yield
     # Shutdown
+    for task in background_tasks:
+        task.cancel()
 
 
 app = FastAPI(
@@ -30,6 +59,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-Id", "ETag"],
 )
 
 # Include API router
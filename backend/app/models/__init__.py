@@ -1,7 +1,7 @@
-from app.models.product import Product, ProductImage, ProductColor, ProductSize
-from app.models.cart import Cart, CartItem
+from app.models.product import Product, ProductImage, ProductColor, ProductSize, ProductSizeStockSlot, ProductCard, CatalogVersion, ProductSearchGram
+from app.models.cart import Cart, CartItem, GuestCart, GuestCartItem
 from app.models.user import User
-from app.models.order import Order, OrderItem
+from app.models.order import Order, OrderItem, CheckoutTicket
 from app.models.wishlist import WishlistItem
 
 __all__ = [
@@ -9,10 +9,17 @@ __all__ = [
     "ProductImage",
     "ProductColor",
     "ProductSize",
+    "ProductSizeStockSlot",
+    "ProductCard",
+    "CatalogVersion",
+    "ProductSearchGram",
     "Cart",
     "CartItem",
+    "GuestCart",
+    "GuestCartItem",
     "User",
     "Order",
     "OrderItem",
+    "CheckoutTicket",
     "WishlistItem",
 ]
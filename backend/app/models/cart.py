@@ -1,3 +1,4 @@
+from sqlalchemy import DDL, Index, event
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 from uuid import uuid4
@@ -15,6 +16,8 @@ class Cart(SQLModel, table=True):
     user_id: Optional[str] = Field(default=None, foreign_key="users.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Bumped on every change to the cart's lines; 0 until the first save
+    version: int = 0
 
     # Relationships
     items: list["CartItem"] = Relationship(back_populates="cart")
@@ -23,6 +26,16 @@ class Cart(SQLModel, table=True):
 
 class CartItem(SQLModel, table=True):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        Index(
+            "uq_cart_items_line",
+            "cart_id",
+            "product_id",
+            "color_id",
+            "size_id",
+            unique=True,
+        ),
+    )
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     cart_id: str = Field(foreign_key="carts.id")
@@ -35,3 +48,56 @@ class CartItem(SQLModel, table=True):
 
     # Relationships
     cart: Optional[Cart] = Relationship(back_populates="items")
+
+
+class GuestCart(SQLModel, table=True):
+    """Guest cart kept in an UNLOGGED table (GUEST_CART_BACKEND = "unlogged").
+
+    Unlogged tables skip the WAL: writes are cheaper and are not replicated,
+    and PostgreSQL empties the table after a crash. Guest carts are copied
+    into ``carts`` at login and checkout.
+    """
+
+    __tablename__ = "guest_carts"
+
+    id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
+    session_id: str = Field(unique=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    version: int = 0
+
+    @property
+    def user_id(self) -> None:
+        return None
+
+
+class GuestCartItem(SQLModel, table=True):
+    __tablename__ = "guest_cart_items"
+    __table_args__ = (
+        Index(
+            "uq_guest_cart_items_line",
+            "cart_id",
+            "product_id",
+            "color_id",
+            "size_id",
+            unique=True,
+        ),
+    )
+
+    id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
+    cart_id: str = Field(foreign_key="guest_carts.id")
+    product_id: str = Field(foreign_key="products.id")
+    color_id: str
+    size_id: str
+    quantity: int = 1
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# Items first: a logged table may not reference an unlogged one
+for _table in ("guest_cart_items", "guest_carts"):
+    event.listen(
+        GuestCartItem.__table__,
+        "after_create",
+        DDL(f"ALTER TABLE {_table} SET UNLOGGED").execute_if(dialect="postgresql"),
+    )
@@ -1,3 +1,4 @@
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 from uuid import uuid4
@@ -9,11 +10,14 @@ if TYPE_CHECKING:
 
 class Order(SQLModel, table=True):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", text("created_at DESC")),
+    )
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     order_number: str = Field(index=True, unique=True)
     session_id: Optional[str] = Field(default=None, index=True)
-    user_id: Optional[str] = Field(default=None, foreign_key="users.id", index=True)
+    user_id: Optional[str] = Field(default=None, foreign_key="users.id")
     status: str = Field(default="pending")
     payment_method: str = Field(default="credit_card")
     payment_status: str = Field(default="paid")
@@ -39,7 +43,7 @@ class OrderItem(SQLModel, table=True):
     __tablename__ = "order_items"
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    order_id: str = Field(foreign_key="orders.id")
+    order_id: str = Field(foreign_key="orders.id", index=True)
     product_id: str
     product_slug: str = Field(default="")
     product_name: str
@@ -54,3 +58,22 @@ class OrderItem(SQLModel, table=True):
 
     # Relationships
     order: Optional[Order] = Relationship(back_populates="items")
+
+
+class CheckoutTicket(SQLModel, table=True):
+    """A queued checkout, admitted into an order by app.jobs.checkout_worker."""
+
+    __tablename__ = "checkout_tickets"
+    __table_args__ = (
+        Index("ix_checkout_tickets_status_created_at", "status", "created_at"),
+    )
+
+    id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
+    session_id: Optional[str] = None
+    user_id: Optional[str] = Field(default=None, foreign_key="users.id")
+    status: str = Field(default="queued")  # queued, completed or failed
+    request: str  # CreateOrderRequest as JSON
+    order_id: Optional[str] = Field(default=None, foreign_key="orders.id")
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
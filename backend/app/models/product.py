@@ -1,3 +1,4 @@
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 from uuid import uuid4
@@ -26,6 +27,10 @@ class Product(SQLModel, table=True):
 
 class ProductImage(SQLModel, table=True):
     __tablename__ = "product_images"
+    __table_args__ = (
+        Index("ix_product_images_product_id_sort_order", "product_id", "sort_order"),
+        Index("ix_product_images_main", "product_id", postgresql_where=text("is_main")),
+    )
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     product_id: str = Field(foreign_key="products.id")
@@ -42,7 +47,7 @@ class ProductColor(SQLModel, table=True):
     __tablename__ = "product_colors"
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    product_id: str = Field(foreign_key="products.id")
+    product_id: str = Field(foreign_key="products.id", index=True)
     name: str
     code: str  # Hex color code
     image_url: str  # Thumbnail image for color selector
@@ -56,10 +61,68 @@ class ProductSize(SQLModel, table=True):
     __tablename__ = "product_sizes"
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    product_id: str = Field(foreign_key="products.id")
+    product_id: str = Field(foreign_key="products.id", index=True)
     size: str  # e.g., "US 8", "US 9", "M", "L"
     stock: int = 0
     sort_order: int = 0
+    # > 0 while checkout takes this size's stock from that many
+    # ProductSizeStockSlot counters (see app.jobs.stock_shards)
+    stock_slots: int = 0
 
     # Relationships
     product: Optional[Product] = Relationship(back_populates="sizes")
+
+
+class ProductSizeStockSlot(SQLModel, table=True):
+    """One of the counters a hot size's stock is split across during a sale."""
+
+    __tablename__ = "product_size_stock_slots"
+
+    size_id: str = Field(foreign_key="product_sizes.id", primary_key=True)
+    slot: int = Field(primary_key=True)
+    stock: int = 0
+
+
+class ProductCard(SQLModel, table=True):
+    """Denormalized listing row, rebuilt from the catalog tables on every change."""
+
+    __tablename__ = "product_cards"
+    __table_args__ = (
+        Index("ix_product_cards_created_at", "created_at", "product_id"),
+        Index("ix_product_cards_price", "price", "product_id"),
+        Index("ix_product_cards_category_created_at", "category", "created_at", "product_id"),
+        Index("ix_product_cards_category_price", "category", "price", "product_id"),
+    )
+
+    product_id: str = Field(primary_key=True)
+    slug: str = Field(unique=True)
+    name: str
+    subtitle: str
+    price: float
+    original_price: Optional[float] = None
+    category: str
+    main_image_url: str = ""
+    color_count: int = 0
+    in_stock: bool = False
+    created_at: datetime
+    refreshed_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class CatalogVersion(SQLModel, table=True):
+    """Single row counting catalog changes; versions the product list ETag."""
+
+    __tablename__ = "catalog_version"
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ProductSearchGram(SQLModel, table=True):
+    """Inverted n-gram index over product name, subtitle and description."""
+
+    __tablename__ = "product_search_grams"
+
+    gram: str = Field(primary_key=True)
+    product_id: str = Field(primary_key=True, index=True)
+    weight: int = 1
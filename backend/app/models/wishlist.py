@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 from uuid import uuid4
@@ -11,11 +12,12 @@ if TYPE_CHECKING:
 class WishlistItem(SQLModel, table=True):
     __tablename__ = "wishlist_items"
     __table_args__ = (
+        Index("ix_wishlist_items_user_id_created_at", "user_id", "created_at"),
         {"extend_existing": True},
     )
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    user_id: str = Field(foreign_key="users.id", index=True)
+    user_id: str = Field(foreign_key="users.id")
     product_id: str = Field(foreign_key="products.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -4,12 +4,19 @@ from app.schemas.product import (
     ProductImageResponse,
     ProductColorResponse,
     ProductSizeResponse,
+    ProductBatchRequest,
+    FacetCount,
+    PriceBucket,
+    ProductFacetsResponse,
 )
 from app.schemas.cart import (
     CartResponse,
     CartItemResponse,
+    CartSummaryResponse,
     AddToCartRequest,
     UpdateCartItemRequest,
+    CartOperation,
+    CartBatchRequest,
 )
 from app.schemas.user import (
     UserRegisterRequest,
@@ -25,6 +32,8 @@ from app.schemas.order import (
     OrderItemResponse,
     OrderResponse,
     OrderListItem,
+    CheckoutModeResponse,
+    CheckoutTicketResponse,
 )
 from app.schemas.wishlist import (
     AddWishlistRequest,
@@ -38,10 +47,17 @@ __all__ = [
     "ProductImageResponse",
     "ProductColorResponse",
     "ProductSizeResponse",
+    "ProductBatchRequest",
+    "FacetCount",
+    "PriceBucket",
+    "ProductFacetsResponse",
     "CartResponse",
     "CartItemResponse",
+    "CartSummaryResponse",
     "AddToCartRequest",
     "UpdateCartItemRequest",
+    "CartOperation",
+    "CartBatchRequest",
     "UserRegisterRequest",
     "UserLoginRequest",
     "TokenResponse",
@@ -53,6 +69,8 @@ __all__ = [
     "OrderItemResponse",
     "OrderResponse",
     "OrderListItem",
+    "CheckoutModeResponse",
+    "CheckoutTicketResponse",
     "AddWishlistRequest",
     "WishlistItemResponse",
     "WishlistResponse",
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 
 class CartItemResponse(BaseModel):
@@ -26,6 +26,7 @@ class CartResponse(BaseModel):
     items: list[CartItemResponse]
     itemCount: int
     subtotal: float
+    version: int = 0
     createdAt: datetime
     updatedAt: datetime
 
@@ -33,6 +34,11 @@ class CartResponse(BaseModel):
         from_attributes = True
 
 
+class CartSummaryResponse(BaseModel):
+    itemCount: int
+    subtotal: float
+
+
 class AddToCartRequest(BaseModel):
     productId: str
     colorId: str
@@ -42,3 +48,27 @@ class AddToCartRequest(BaseModel):
 
 class UpdateCartItemRequest(BaseModel):
     quantity: int = Field(ge=0, le=10)
+
+
+class CartOperation(BaseModel):
+    op: Literal["add", "update", "remove"]
+    itemId: Optional[str] = None
+    productId: Optional[str] = None
+    colorId: Optional[str] = None
+    sizeId: Optional[str] = None
+    quantity: int = Field(default=1, ge=0, le=10)
+
+    @model_validator(mode="after")
+    def check_fields(self) -> "CartOperation":
+        if self.op == "add":
+            if not (self.productId and self.colorId and self.sizeId):
+                raise ValueError("add requires productId, colorId and sizeId")
+            if self.quantity < 1:
+                raise ValueError("add requires a quantity of at least 1")
+        elif not self.itemId:
+            raise ValueError(f"{self.op} requires itemId")
+        return self
+
+
+class CartBatchRequest(BaseModel):
+    operations: list[CartOperation] = Field(min_length=1)
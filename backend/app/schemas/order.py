@@ -55,6 +55,22 @@ class OrderResponse(BaseModel):
         from_attributes = True
 
 
+class CheckoutModeResponse(BaseModel):
+    # Whether POST /orders/queue is available to this caller
+    queue: bool
+
+
+class CheckoutTicketResponse(BaseModel):
+    id: str
+    status: str
+    orderId: Optional[str] = None
+    error: Optional[str] = None
+    # Tickets ahead of this one while it is queued
+    queuePosition: Optional[int] = None
+    createdAt: datetime
+    updatedAt: datetime
+
+
 class OrderListItem(BaseModel):
     id: str
     orderNumber: str
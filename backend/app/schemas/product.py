@@ -100,3 +100,25 @@ class ProductListItemResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ProductBatchRequest(BaseModel):
+    ids: list[str] = []
+    slugs: list[str] = []
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class PriceBucket(BaseModel):
+    min: float
+    max: float
+    count: int
+
+
+class ProductFacetsResponse(BaseModel):
+    categories: list[FacetCount]
+    priceBuckets: list[PriceBucket]
+    sizes: list[FacetCount]
@@ -1,3 +1,4 @@
+import logging
 from datetime import datetime
 
 import jwt
@@ -11,7 +12,7 @@ from app.core.security import (
     get_password_hash,
     verify_password,
 )
-from app.models import Cart, CartItem, User
+from app.models import User
 from app.schemas import (
     ChangePasswordRequest,
     TokenResponse,
@@ -19,6 +20,9 @@ from app.schemas import (
     UserResponse,
     UserUpdateRequest,
 )
+from app.services.cart_service import CartService
+
+logger = logging.getLogger(__name__)
 
 
 class AuthService:
@@ -46,10 +50,7 @@ class AuthService:
         self.session.refresh(user)
 
         if session_id:
-            try:
-                self._merge_cart(session_id, user.id)
-            except Exception:
-                pass
+            self._merge_cart(session_id, user.id)
 
         return TokenResponse(
             access_token=create_access_token(user.id),
@@ -66,10 +67,7 @@ class AuthService:
             raise BadRequestError("Account is inactive")
 
         if session_id:
-            try:
-                self._merge_cart(session_id, user.id)
-            except Exception:
-                pass
+            self._merge_cart(session_id, user.id)
 
         return TokenResponse(
             access_token=create_access_token(user.id),
@@ -136,44 +134,9 @@ class AuthService:
         self.session.commit()
 
     def _merge_cart(self, session_id: str, user_id: str) -> None:
-        anon_cart = self.session.exec(
-            select(Cart).where(Cart.session_id == session_id, Cart.user_id.is_(None))
-        ).first()
-        if not anon_cart or not anon_cart.items:
-            return
-
-        user_cart = self.session.exec(
-            select(Cart).where(Cart.user_id == user_id)
-        ).first()
-        if not user_cart:
-            user_cart = Cart(user_id=user_id)
-            self.session.add(user_cart)
-            self.session.commit()
-            self.session.refresh(user_cart)
-
-        for anon_item in anon_cart.items:
-            existing = self.session.exec(
-                select(CartItem).where(
-                    CartItem.cart_id == user_cart.id,
-                    CartItem.product_id == anon_item.product_id,
-                    CartItem.color_id == anon_item.color_id,
-                    CartItem.size_id == anon_item.size_id,
-                )
-            ).first()
-            if existing:
-                existing.quantity = min(existing.quantity + anon_item.quantity, 10)
-                existing.updated_at = datetime.utcnow()
-            else:
-                new_item = CartItem(
-                    cart_id=user_cart.id,
-                    product_id=anon_item.product_id,
-                    color_id=anon_item.color_id,
-                    size_id=anon_item.size_id,
-                    quantity=min(anon_item.quantity, 10),
-                )
-                self.session.add(new_item)
-            self.session.delete(anon_item)
-
-        self.session.delete(anon_cart)
-        user_cart.updated_at = datetime.utcnow()
-        self.session.commit()
+        # Signing in must not fail because of the guest cart; log and move on
+        try:
+            CartService(self.session).merge_guest_cart(session_id, user_id)
+        except Exception:
+            self.session.rollback()
+            logger.exception("Failed to merge guest cart into user %s", user_id)
@@ -1,114 +1,278 @@
-from sqlmodel import Session, select
+import logging
+import re
+import time
+from sqlalchemy import String, cast, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, delete, func, select
 from datetime import datetime
-from typing import Optional
-from app.models import Cart, CartItem, Product, ProductColor, ProductSize
-from app.schemas import CartResponse, CartItemResponse, AddToCartRequest
+from typing import Any, Optional
+from app.models import Cart, CartItem
+from app.schemas import (
+    AddToCartRequest,
+    CartItemResponse,
+    CartOperation,
+    CartResponse,
+    CartSummaryResponse,
+)
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.projections import on_catalog_change
 from app.core.exceptions import (
+    BadRequestError,
     CartItemNotFoundError,
-    ProductNotFoundError,
-    OutOfStockError,
-    NotFoundError,
+    PreconditionFailedError,
+)
+from app.core.http import etag_matches
+from app.services.cart_store import (
+    LINE_COLUMNS,
+    MAX_LINE_QUANTITY,
+    CartStore,
+    SqlCartStore,
+    guest_cart_store,
 )
 
+logger = logging.getLogger(__name__)
+
+# Header badge summaries keyed by cart owner. Each entry carries the cart's
+# (id, version), checked on every hit, so writes from other processes (the
+# checkout worker) are seen at the cost of one primary-key lookup.
+_summary_cache = TTLCache(maxsize=10000, ttl=settings.CART_SUMMARY_CACHE_TTL)
+# Subtotals are priced from product_cards; a summary does not say which
+# products it covers, so any price change drops them all
+on_catalog_change(lambda product_ids: _summary_cache.clear(), kinds=("price",))
+
+
+def _summary_key(session_id: Optional[str], user_id: Optional[str]) -> tuple:
+    return ("user", user_id) if user_id else ("session", session_id)
+
+
+# The catalog part of a GET ETag, which If-Match ignores
+_CATALOG_STAMP_RE = re.compile(r';[^",]*"')
+
+
+def cart_etag(cart: Any, catalog_stamp: Optional[datetime] = None) -> str:
+    """ETag of a cart (or CartResponse); clients may also build it from the JSON.
+
+    A cart that was never saved has the same ETag as no cart at all. GET
+    responses also carry ``catalog_stamp``, the latest change to the
+    products in the cart, so a new price is not answered with 304.
+    """
+    tag = f"{cart.id}.{cart.version}" if cart is not None and cart.version else "empty"
+    if catalog_stamp is not None:
+        tag += f";{catalog_stamp:%Y%m%d%H%M%S%f}"
+    return f'"{tag}"'
+
+
+def invalidate_cart_summary(
+    session_id: Optional[str] = None, user_id: Optional[str] = None
+) -> None:
+    """Drop the cached summary after a committed change to a cart's lines."""
+    _summary_cache.delete(_summary_key(session_id, user_id))
+
 
 class CartService:
     def __init__(self, session: Session):
         self.session = session
 
-    def get_or_create_cart(
-        self, session_id: Optional[str] = None, user_id: Optional[str] = None
-    ) -> Cart:
+    def store(self, user_id: Optional[str] = None) -> CartStore:
+        """Where this owner's cart lives: user carts are always in SQL."""
         if user_id:
-            cart = self.session.exec(
-                select(Cart).where(Cart.user_id == user_id)
-            ).first()
-            if not cart:
-                cart = Cart(user_id=user_id)
-                self.session.add(cart)
-                self.session.commit()
-                self.session.refresh(cart)
-            return cart
+            return SqlCartStore(self.session)
+        return guest_cart_store(self.session)
 
+    def find_cart(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Optional[Any]:
+        """Look up the caller's cart without creating one."""
+        return self.store(user_id).find_cart(session_id=session_id, user_id=user_id)
+
+    def get_etag(self, cart: Optional[Any], user_id: Optional[str] = None) -> str:
+        """ETag for GET: the cart version plus the catalog state of its lines."""
+        if cart is None:
+            return cart_etag(None)
+        return cart_etag(cart, self.store(user_id).catalog_stamp(cart))
+
+    def flush_guest_cart(self, session_id: Optional[str]) -> None:
+        """Make a guest cart visible in the cart tables for this transaction.
+
+        Call before reading a guest cart from SQL (login merge, checkout).
+        A no-op unless guest carts are kept outside the database.
+        """
         if session_id:
-            cart = self.session.exec(
-                select(Cart).where(
-                    Cart.session_id == session_id, Cart.user_id.is_(None)
+            self.store().flush(session_id)
+
+    def merge_guest_cart(self, session_id: str, user_id: str) -> int:
+        """Fold the guest cart into the user's cart and delete it.
+
+        Lines for the same variant are added together (capped at 10) by one
+        INSERT ... SELECT ... ON CONFLICT, so the cost does not grow with the
+        number of lines. Every guest line is carried over before the guest
+        cart is deleted. Returns the number of lines merged.
+        """
+        started = time.perf_counter()
+        self.flush_guest_cart(session_id)
+
+        # Lock the guest cart so concurrent logins merge it only once
+        guest_cart_id = self.session.exec(
+            select(Cart.id)
+            .where(Cart.session_id == session_id, Cart.user_id.is_(None))
+            .with_for_update()
+        ).first()
+        if not guest_cart_id:
+            self.session.rollback()
+            return 0
+
+        merged = 0
+        now = datetime.utcnow()
+        has_lines = self.session.exec(
+            select(CartItem.id).where(CartItem.cart_id == guest_cart_id).limit(1)
+        ).first()
+        if has_lines:
+            user_cart = SqlCartStore(self.session).get_or_create_cart(user_id=user_id)
+            source = (
+                select(
+                    cast(func.gen_random_uuid(), String),
+                    literal(user_cart.id),
+                    CartItem.product_id,
+                    CartItem.color_id,
+                    CartItem.size_id,
+                    func.least(CartItem.quantity, MAX_LINE_QUANTITY),
+                    CartItem.created_at,
+                    literal(now),
                 )
-            ).first()
-            if not cart:
-                cart = Cart(session_id=session_id)
-                self.session.add(cart)
-                self.session.commit()
-                self.session.refresh(cart)
-            return cart
-
-        cart = Cart()
-        self.session.add(cart)
+                .where(CartItem.cart_id == guest_cart_id)
+            )
+            statement = pg_insert(CartItem).from_select(
+                [
+                    "id",
+                    "cart_id",
+                    "product_id",
+                    "color_id",
+                    "size_id",
+                    "quantity",
+                    "created_at",
+                    "updated_at",
+                ],
+                source,
+            )
+            merged = self.session.exec(
+                statement.on_conflict_do_update(
+                    index_elements=LINE_COLUMNS,
+                    set_={
+                        "quantity": func.least(
+                            CartItem.quantity + statement.excluded.quantity,
+                            MAX_LINE_QUANTITY,
+                        ),
+                        "updated_at": statement.excluded.updated_at,
+                    },
+                )
+            ).rowcount
+            user_cart.updated_at = now
+            user_cart.version += 1
+
+        self.session.exec(delete(CartItem).where(CartItem.cart_id == guest_cart_id))
+        self.session.exec(delete(Cart).where(Cart.id == guest_cart_id))
         self.session.commit()
-        self.session.refresh(cart)
-        return cart
+        invalidate_cart_summary(session_id=session_id)
+        invalidate_cart_summary(user_id=user_id)
+
+        logger.info(
+            "Merged %d guest cart lines into user %s in %.1f ms",
+            merged,
+            user_id,
+            (time.perf_counter() - started) * 1000,
+        )
+        return merged
 
     def get_cart(
-        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+        self,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        cart: Optional[Any] = None,
     ) -> CartResponse:
-        cart = self.get_or_create_cart(session_id=session_id, user_id=user_id)
-        return self._build_cart_response(cart)
+        """The cart snapshot; pass ``cart`` if the caller already looked it up."""
+        store = self.store(user_id)
+        if cart is None:
+            cart = store.find_cart(session_id=session_id, user_id=user_id)
+        if not cart:
+            # Reads never write: visitors without a cart get an empty one
+            return self._empty_cart_response(session_id)
+        return self._build_cart_response(cart, store.rows(cart))
+
+    def get_summary(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> CartSummaryResponse:
+        key = _summary_key(session_id, user_id)
+        store = self.store(user_id)
+        version = store.cart_version(session_id=session_id, user_id=user_id)
+        cached = _summary_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        item_count, subtotal = store.summarize(session_id=session_id, user_id=user_id)
+        summary = CartSummaryResponse(itemCount=item_count, subtotal=subtotal)
+        _summary_cache.set(key, (version, summary))
+        return summary
 
     def add_item(
         self,
         request: AddToCartRequest,
         session_id: Optional[str] = None,
         user_id: Optional[str] = None,
+        if_match: Optional[str] = None,
     ) -> CartResponse:
-        cart = self.get_or_create_cart(session_id=session_id, user_id=user_id)
+        store = self.store(user_id)
+        cart = store.get_or_create_cart(session_id=session_id, user_id=user_id)
+        expected_version = self._expected_version(cart, if_match)
+        now = datetime.utcnow()
+        store.add_line(cart, request, now)
 
-        product = self.session.exec(
-            select(Product).where(Product.id == request.productId)
-        ).first()
-        if not product:
-            raise ProductNotFoundError()
+        return self._save(store, cart, now, expected_version)
 
-        size = self.session.exec(
-            select(ProductSize).where(
-                ProductSize.id == request.sizeId,
-                ProductSize.product_id == request.productId,
-            )
-        ).first()
-        if not size:
-            raise NotFoundError("Size not found")
-        if size.stock < request.quantity:
-            raise OutOfStockError()
-
-        existing_item = self.session.exec(
-            select(CartItem).where(
-                CartItem.cart_id == cart.id,
-                CartItem.product_id == request.productId,
-                CartItem.color_id == request.colorId,
-                CartItem.size_id == request.sizeId,
-            )
-        ).first()
+    def apply_operations(
+        self,
+        operations: list[CartOperation],
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        if_match: Optional[str] = None,
+    ) -> CartResponse:
+        """Apply add/update/remove operations in one transaction.
 
-        if existing_item:
-            new_quantity = existing_item.quantity + request.quantity
-            if new_quantity > size.stock:
-                raise OutOfStockError()
-            existing_item.quantity = min(new_quantity, 10)
-            existing_item.updated_at = datetime.utcnow()
-        else:
-            new_item = CartItem(
-                cart_id=cart.id,
-                product_id=request.productId,
-                color_id=request.colorId,
-                size_id=request.sizeId,
-                quantity=request.quantity,
+        Operations run in order; if any fails, none of them are kept.
+        """
+        if len(operations) > settings.CART_BATCH_MAX:
+            raise BadRequestError(
+                f"At most {settings.CART_BATCH_MAX} cart operations can be applied at once"
             )
-            self.session.add(new_item)
 
-        cart.updated_at = datetime.utcnow()
-        self.session.commit()
-        self.session.refresh(cart)
+        store = self.store(user_id)
+        if any(operation.op == "add" for operation in operations):
+            cart = store.get_or_create_cart(session_id=session_id, user_id=user_id)
+        else:
+            cart = store.find_cart(session_id=session_id, user_id=user_id)
+            if not cart:
+                raise CartItemNotFoundError()
+        expected_version = self._expected_version(cart, if_match)
+
+        now = datetime.utcnow()
+        for operation in operations:
+            if operation.op == "add":
+                store.add_line(
+                    cart,
+                    AddToCartRequest(
+                        productId=operation.productId,
+                        colorId=operation.colorId,
+                        sizeId=operation.sizeId,
+                        quantity=operation.quantity,
+                    ),
+                    now,
+                )
+            elif operation.op == "update":
+                store.set_line_quantity(cart, operation.itemId, operation.quantity, now)
+            else:
+                store.set_line_quantity(cart, operation.itemId, 0, now)
 
-        return self._build_cart_response(cart)
+        return self._save(store, cart, now, expected_version)
 
     def update_item(
         self,
@@ -116,102 +280,115 @@ class CartService:
         quantity: int,
         session_id: Optional[str] = None,
         user_id: Optional[str] = None,
+        if_match: Optional[str] = None,
     ) -> CartResponse:
-        cart = self.get_or_create_cart(session_id=session_id, user_id=user_id)
-
-        item = self.session.exec(
-            select(CartItem).where(
-                CartItem.id == item_id, CartItem.cart_id == cart.id
-            )
-        ).first()
-
-        if not item:
+        store = self.store(user_id)
+        cart = store.find_cart(session_id=session_id, user_id=user_id)
+        if not cart:
             raise CartItemNotFoundError()
+        expected_version = self._expected_version(cart, if_match)
 
-        if quantity == 0:
-            self.session.delete(item)
-        else:
-            size = self.session.exec(
-                select(ProductSize).where(ProductSize.id == item.size_id)
-            ).first()
-            if size and quantity > size.stock:
-                raise OutOfStockError()
-
-            item.quantity = min(quantity, 10)
-            item.updated_at = datetime.utcnow()
+        now = datetime.utcnow()
+        store.set_line_quantity(cart, item_id, quantity, now)
 
-        cart.updated_at = datetime.utcnow()
-        self.session.commit()
-        self.session.refresh(cart)
-
-        return self._build_cart_response(cart)
+        return self._save(store, cart, now, expected_version)
 
     def remove_item(
         self,
         item_id: str,
         session_id: Optional[str] = None,
         user_id: Optional[str] = None,
+        if_match: Optional[str] = None,
     ) -> CartResponse:
         return self.update_item(
-            item_id, 0, session_id=session_id, user_id=user_id
+            item_id, 0, session_id=session_id, user_id=user_id, if_match=if_match
         )
 
     def clear_cart(
-        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+        self,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        if_match: Optional[str] = None,
     ) -> CartResponse:
-        cart = self.get_or_create_cart(session_id=session_id, user_id=user_id)
-
-        for item in cart.items:
-            self.session.delete(item)
+        store = self.store(user_id)
+        cart = store.find_cart(session_id=session_id, user_id=user_id)
+        expected_version = self._expected_version(cart, if_match)
+        if not cart:
+            return self._empty_cart_response(session_id)
+
+        store.clear_lines(cart)
+
+        return self._save(store, cart, datetime.utcnow(), expected_version)
+
+    def _expected_version(self, cart: Optional[Any], if_match: Optional[str]) -> Optional[int]:
+        """The version an If-Match mutation requires the cart to still have."""
+        if if_match is None:
+            return None
+        # Only the version matters for a write; the catalog may have moved on
+        if not etag_matches(_CATALOG_STAMP_RE.sub('"', if_match), cart_etag(cart)):
+            raise PreconditionFailedError("Cart has been modified")
+        return cart.version if cart else 0
+
+    def _save(
+        self,
+        store: CartStore,
+        cart: Any,
+        now: datetime,
+        expected_version: Optional[int] = None,
+    ) -> CartResponse:
+        """Publish a change to the cart's lines and return the new snapshot."""
+        owner = (cart.session_id, cart.user_id)
+        store.save(cart, now, expected_version)
+        invalidate_cart_summary(*owner)
 
-        cart.updated_at = datetime.utcnow()
-        self.session.commit()
-        self.session.refresh(cart)
+        return self._build_cart_response(cart, store.rows(cart))
 
-        return self._build_cart_response(cart)
+    def _empty_cart_response(self, session_id: Optional[str] = None) -> CartResponse:
+        now = datetime.utcnow()
+        return CartResponse(
+            id="",
+            sessionId=session_id,
+            items=[],
+            itemCount=0,
+            subtotal=0.0,
+            createdAt=now,
+            updatedAt=now,
+        )
 
-    def _build_cart_response(self, cart: Cart) -> CartResponse:
+    def _build_cart_response(self, cart: Any, rows: list[tuple]) -> CartResponse:
         items = []
         subtotal = 0.0
         item_count = 0
 
-        for item in cart.items:
-            product = self.session.exec(
-                select(Product).where(Product.id == item.product_id)
-            ).first()
-            if not product:
-                continue
-
-            color = self.session.exec(
-                select(ProductColor).where(ProductColor.id == item.color_id)
-            ).first()
-
-            size = self.session.exec(
-                select(ProductSize).where(ProductSize.id == item.size_id)
-            ).first()
-
-            main_image = next(
-                (img for img in product.images if img.is_main),
-                product.images[0] if product.images else None,
-            )
-
-            item_total = product.price * item.quantity
-            subtotal += item_total
-            item_count += item.quantity
+        for (
+            item_id,
+            product_id,
+            color_id,
+            size_id,
+            quantity,
+            slug,
+            name,
+            price,
+            image_url,
+            color_name,
+            size_label,
+        ) in rows:
+            subtotal += price * quantity
+            item_count += quantity
 
             items.append(
                 CartItemResponse(
-                    id=item.id,
-                    productId=product.id,
-                    productSlug=product.slug,
-                    productName=product.name,
-                    productImage=main_image.url if main_image else "",
-                    colorId=item.color_id,
-                    colorName=color.name if color else "",
-                    sizeId=item.size_id,
-                    size=size.size if size else "",
-                    price=product.price,
-                    quantity=item.quantity,
+                    id=item_id,
+                    productId=product_id,
+                    productSlug=slug,
+                    productName=name,
+                    productImage=image_url,
+                    colorId=color_id,
+                    colorName=color_name or "",
+                    sizeId=size_id,
+                    size=size_label or "",
+                    price=price,
+                    quantity=quantity,
                 )
             )
 
@@ -221,6 +398,7 @@ class CartService:
             items=items,
             itemCount=item_count,
             subtotal=subtotal,
+            version=cart.version,
             createdAt=cart.created_at,
             updatedAt=cart.updated_at,
         )
@@ -0,0 +1,679 @@
+"""Storage backends for cart lines.
+
+:class:`CartService` validates requests and builds responses; a store keeps
+the lines. User carts always live in the ``carts``/``cart_items`` tables.
+Guest carts use the backend named by ``GUEST_CART_BACKEND``:
+
+``sql``
+    The same tables as user carts.
+``unlogged``
+    The UNLOGGED ``guest_carts``/``guest_cart_items`` tables (no WAL, not
+    replicated, emptied after a crash), copied into the cart tables at
+    login and checkout.
+``memory``
+    A per-process dict. Guest carts are only written to the database when
+    they are needed there: at login (to merge into the user's cart) and at
+    checkout. Requires a single worker process or sticky sessions, and
+    carts are lost on restart.
+
+Every store works on a cart within one unit of work: mutations are applied
+to the cart returned by :meth:`CartStore.find_cart` /
+:meth:`CartStore.get_or_create_cart` and published by :meth:`CartStore.save`.
+Nothing is kept if a mutation raises before ``save``.
+"""
+import copy
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Optional
+from uuid import uuid4
+
+from sqlalchemy import event, false, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, delete, func, select, update
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.exceptions import (
+    CartItemNotFoundError,
+    NotFoundError,
+    OutOfStockError,
+    PreconditionFailedError,
+    ProductNotFoundError,
+)
+from app.models import (
+    Cart,
+    CartItem,
+    GuestCart,
+    GuestCartItem,
+    Product,
+    ProductCard,
+    ProductColor,
+    ProductSize,
+)
+from app.schemas import AddToCartRequest
+
+MAX_LINE_QUANTITY = 10
+
+LINE_COLUMNS = ["cart_id", "product_id", "color_id", "size_id"]
+
+
+class CartStore(ABC):
+    """Interface shared by the cart storage backends."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    @abstractmethod
+    def find_cart(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Optional[Any]:
+        """The owner's cart, or None. Never creates one."""
+
+    @abstractmethod
+    def get_or_create_cart(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Any:
+        """The owner's cart, started (unsaved) when there is none."""
+
+    @abstractmethod
+    def add_line(self, cart: Any, request: AddToCartRequest, now: datetime) -> None:
+        """Add to the line for this variant, checking stock and the 10-unit cap."""
+
+    @abstractmethod
+    def set_line_quantity(
+        self, cart: Any, item_id: str, quantity: int, now: datetime
+    ) -> None:
+        """Set one line's quantity; zero removes the line."""
+
+    @abstractmethod
+    def clear_lines(self, cart: Any) -> None:
+        """Remove every line."""
+
+    @abstractmethod
+    def save(
+        self, cart: Any, now: datetime, expected_version: Optional[int] = None
+    ) -> None:
+        """Publish the changes made to ``cart`` and bump its version.
+
+        With ``expected_version``, raise :class:`PreconditionFailedError`
+        (keeping nothing) unless the stored cart is still at that version.
+        Stores that replace the cart whole raise it whenever the cart changed
+        since it was loaded.
+        """
+
+    @abstractmethod
+    def rows(self, cart: Any) -> list[tuple]:
+        """Display rows for the cart's lines, oldest first.
+
+        Each row is ``(item_id, product_id, color_id, size_id, quantity,
+        slug, name, price, image_url, color_name, size_label)``; lines whose
+        product no longer exists are left out.
+        """
+
+    @abstractmethod
+    def catalog_stamp(self, cart: Any) -> Optional[datetime]:
+        """Latest refresh of the product cards the cart's lines show, if any."""
+
+    @abstractmethod
+    def cart_version(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Optional[tuple[str, int]]:
+        """``(cart_id, version)`` of the owner's cart, or None without one."""
+
+    @abstractmethod
+    def summarize(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> tuple[int, float]:
+        """``(item_count, subtotal)`` of the owner's cart."""
+
+    def flush(self, session_id: str) -> None:
+        """Write the guest cart to the cart tables as part of this transaction."""
+
+    def _raise_add_error(self, request: AddToCartRequest) -> None:
+        """Explain why an add-to-cart wrote nothing (failure path only)."""
+        self.session.rollback()
+        stock = self.session.exec(
+            select(ProductSize.stock).where(
+                ProductSize.id == request.sizeId,
+                ProductSize.product_id == request.productId,
+            )
+        ).first()
+        if stock is not None:
+            raise OutOfStockError()
+        product = self.session.exec(
+            select(Product.id).where(Product.id == request.productId)
+        ).first()
+        if not product:
+            raise ProductNotFoundError()
+        raise NotFoundError("Size not found")
+
+
+class SqlCartStore(CartStore):
+    """Carts in the ``carts`` and ``cart_items`` tables."""
+
+    cart_model: type = Cart
+    item_model: type = CartItem
+
+    def _owner(self, session_id: Optional[str], user_id: Optional[str]):
+        if user_id:
+            return Cart.user_id == user_id
+        return (Cart.session_id == session_id) & Cart.user_id.is_(None)
+
+    def find_cart(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Optional[Any]:
+        if not (session_id or user_id):
+            return None
+        return self.session.exec(
+            select(self.cart_model).where(self._owner(session_id, user_id))
+        ).first()
+
+    def get_or_create_cart(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Any:
+        # A new cart commits together with its first item
+        cart = self.find_cart(session_id=session_id, user_id=user_id)
+        if not cart:
+            if user_id:
+                cart = self.cart_model(user_id=user_id)
+            else:
+                cart = self.cart_model(session_id=session_id)
+            self.session.add(cart)
+            self.session.flush()
+        return cart
+
+    def add_line(self, cart: Any, request: AddToCartRequest, now: datetime) -> None:
+        items = self.item_model
+        # Insert the line, or add to the existing line for the same variant,
+        # in one statement. The INSERT only yields a row when the size
+        # belongs to the product and has enough stock; the conflict update
+        # only applies while the combined quantity is still in stock.
+        source = select(
+            literal(str(uuid4())),
+            literal(cart.id),
+            ProductSize.product_id,
+            literal(request.colorId),
+            ProductSize.id,
+            literal(request.quantity),
+            literal(now),
+            literal(now),
+        ).where(
+            ProductSize.id == request.sizeId,
+            ProductSize.product_id == request.productId,
+            ProductSize.stock >= request.quantity,
+        )
+        statement = pg_insert(items).from_select(
+            [
+                "id",
+                "cart_id",
+                "product_id",
+                "color_id",
+                "size_id",
+                "quantity",
+                "created_at",
+                "updated_at",
+            ],
+            source,
+        )
+        combined = items.quantity + statement.excluded.quantity
+        size_stock = (
+            select(ProductSize.stock)
+            .where(ProductSize.id == statement.excluded.size_id)
+            .scalar_subquery()
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=LINE_COLUMNS,
+            set_={
+                "quantity": func.least(combined, MAX_LINE_QUANTITY),
+                "updated_at": statement.excluded.updated_at,
+            },
+            where=combined <= size_stock,
+        ).returning(items.id)
+
+        if self.session.exec(statement).first() is None:
+            self._raise_add_error(request)
+
+    def set_line_quantity(
+        self, cart: Any, item_id: str, quantity: int, now: datetime
+    ) -> None:
+        items = self.item_model
+        line = (items.id == item_id) & (items.cart_id == cart.id)
+
+        if quantity == 0:
+            if not self.session.exec(delete(items).where(line)).rowcount:
+                self.session.rollback()
+                raise CartItemNotFoundError()
+        else:
+            quantity = min(quantity, MAX_LINE_QUANTITY)
+            size_stock = (
+                select(ProductSize.stock)
+                .where(ProductSize.id == items.size_id)
+                .scalar_subquery()
+            )
+            updated = self.session.exec(
+                update(items)
+                .where(line, quantity <= func.coalesce(size_stock, quantity))
+                .values(quantity=quantity, updated_at=now)
+            ).rowcount
+            if not updated:
+                exists = self.session.exec(select(items.id).where(line)).first()
+                self.session.rollback()
+                if exists:
+                    raise OutOfStockError()
+                raise CartItemNotFoundError()
+
+    def clear_lines(self, cart: Any) -> None:
+        items = self.item_model
+        self.session.exec(delete(items).where(items.cart_id == cart.id))
+
+    def save(
+        self, cart: Any, now: datetime, expected_version: Optional[int] = None
+    ) -> None:
+        carts = self.cart_model
+        # Check and bump the version in one UPDATE; a concurrent writer that
+        # got there first makes it match no row
+        condition = carts.id == cart.id
+        if expected_version is not None:
+            condition &= carts.version == expected_version
+        version = self.session.exec(
+            update(carts)
+            .where(condition)
+            .values(version=carts.version + 1, updated_at=now)
+            .returning(carts.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if version is None:
+            self.session.rollback()
+            raise PreconditionFailedError("Cart has been modified")
+
+        # Detached, the cart keeps its loaded fields through the commit and
+        # the response can be built without reloading it
+        self.session.expunge(cart)
+        cart.version = version
+        cart.updated_at = now
+        self.session.commit()
+
+    def rows(self, cart: Any) -> list[tuple]:
+        items = self.item_model
+        # One statement for every line: product fields and the main image
+        # come from product_cards, color/size names from their tables.
+        return self.session.exec(
+            select(
+                items.id,
+                items.product_id,
+                items.color_id,
+                items.size_id,
+                items.quantity,
+                ProductCard.slug,
+                ProductCard.name,
+                ProductCard.price,
+                ProductCard.main_image_url,
+                ProductColor.name,
+                ProductSize.size,
+            )
+            .join(ProductCard, ProductCard.product_id == items.product_id)
+            .outerjoin(ProductColor, ProductColor.id == items.color_id)
+            .outerjoin(ProductSize, ProductSize.id == items.size_id)
+            .where(items.cart_id == cart.id)
+            .order_by(items.created_at, items.id)
+        ).all()
+
+    def catalog_stamp(self, cart: Any) -> Optional[datetime]:
+        items = self.item_model
+        return self.session.exec(
+            select(func.max(ProductCard.refreshed_at))
+            .join(items, items.product_id == ProductCard.product_id)
+            .where(items.cart_id == cart.id)
+        ).one()
+
+    def cart_version(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Optional[tuple[str, int]]:
+        if not (session_id or user_id):
+            return None
+        carts = self.cart_model
+        row = self.session.exec(
+            select(carts.id, carts.version).where(self._owner(session_id, user_id))
+        ).first()
+        return tuple(row) if row else None
+
+    def summarize(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> tuple[int, float]:
+        carts, items = self.cart_model, self.item_model
+        return self.session.exec(
+            select(
+                func.coalesce(func.sum(items.quantity), 0),
+                func.coalesce(func.sum(items.quantity * ProductCard.price), 0),
+            )
+            .select_from(carts)
+            .join(items, items.cart_id == carts.id)
+            .join(ProductCard, ProductCard.product_id == items.product_id)
+            .where(self._owner(session_id, user_id))
+        ).one()
+
+
+class UnloggedCartStore(SqlCartStore):
+    """Guest carts in the UNLOGGED ``guest_carts``/``guest_cart_items`` tables."""
+
+    cart_model = GuestCart
+    item_model = GuestCartItem
+
+    def _owner(self, session_id: Optional[str], user_id: Optional[str]):
+        # Guest tables never hold user carts
+        if user_id:
+            return false()
+        return GuestCart.session_id == session_id
+
+    def flush(self, session_id: str) -> None:
+        guest_cart = self.find_cart(session_id=session_id)
+        if not guest_cart:
+            return
+
+        now = datetime.utcnow()
+        cart = SqlCartStore(self.session).get_or_create_cart(session_id=session_id)
+        source = select(
+            GuestCartItem.id,
+            literal(cart.id),
+            GuestCartItem.product_id,
+            GuestCartItem.color_id,
+            GuestCartItem.size_id,
+            GuestCartItem.quantity,
+            GuestCartItem.created_at,
+            GuestCartItem.updated_at,
+        ).where(GuestCartItem.cart_id == guest_cart.id)
+        statement = pg_insert(CartItem).from_select(
+            [
+                "id",
+                "cart_id",
+                "product_id",
+                "color_id",
+                "size_id",
+                "quantity",
+                "created_at",
+                "updated_at",
+            ],
+            source,
+        )
+        self.session.exec(
+            statement.on_conflict_do_update(
+                index_elements=LINE_COLUMNS,
+                set_={
+                    "quantity": func.least(
+                        CartItem.quantity + statement.excluded.quantity,
+                        MAX_LINE_QUANTITY,
+                    ),
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+        )
+        # Moved, not copied: the guest rows go in the same transaction
+        self.session.exec(
+            delete(GuestCartItem).where(GuestCartItem.cart_id == guest_cart.id)
+        )
+        self.session.exec(delete(GuestCart).where(GuestCart.id == guest_cart.id))
+        cart.updated_at = now
+        cart.version += 1
+
+
+@dataclass
+class MemoryCartLine:
+    id: str
+    product_id: str
+    color_id: str
+    size_id: str
+    quantity: int
+    created_at: datetime
+
+
+@dataclass
+class MemoryCart:
+    """An in-memory cart with the same header fields as :class:`Cart`."""
+
+    session_id: str
+    id: str = field(default_factory=lambda: str(uuid4()))
+    user_id: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+    version: int = 0
+    lines: list[MemoryCartLine] = field(default_factory=list)
+
+
+_guest_carts = TTLCache(
+    maxsize=settings.GUEST_CART_MEMORY_MAX, ttl=settings.CART_TTL_DAYS * 86400
+)
+_guest_cart_lock = threading.Lock()
+_FLUSHED_KEY = "flushed_guest_carts"
+
+
+class MemoryCartStore(CartStore):
+    """Guest carts held in process memory.
+
+    Entries expire ``CART_TTL_DAYS`` after their last change. Product data
+    is still read from the database; only cart writes stay in memory.
+    """
+
+    def find_cart(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Optional[MemoryCart]:
+        if user_id or not session_id:
+            return None
+        cart = _guest_carts.get(session_id)
+        # Work on a copy so a failed mutation leaves the stored cart untouched
+        return copy.deepcopy(cart) if cart is not None else None
+
+    def get_or_create_cart(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> MemoryCart:
+        if user_id:
+            raise ValueError("MemoryCartStore only holds guest carts")
+        return self.find_cart(session_id=session_id) or MemoryCart(session_id=session_id)
+
+    def add_line(self, cart: MemoryCart, request: AddToCartRequest, now: datetime) -> None:
+        stock = self.session.exec(
+            select(ProductSize.stock).where(
+                ProductSize.id == request.sizeId,
+                ProductSize.product_id == request.productId,
+            )
+        ).first()
+        if stock is None:
+            self._raise_add_error(request)
+
+        line = next(
+            (
+                line
+                for line in cart.lines
+                if (line.product_id, line.color_id, line.size_id)
+                == (request.productId, request.colorId, request.sizeId)
+            ),
+            None,
+        )
+        quantity = request.quantity + (line.quantity if line else 0)
+        if quantity > stock:
+            raise OutOfStockError()
+
+        if line:
+            line.quantity = min(quantity, MAX_LINE_QUANTITY)
+        else:
+            cart.lines.append(
+                MemoryCartLine(
+                    id=str(uuid4()),
+                    product_id=request.productId,
+                    color_id=request.colorId,
+                    size_id=request.sizeId,
+                    quantity=request.quantity,
+                    created_at=now,
+                )
+            )
+
+    def set_line_quantity(
+        self, cart: MemoryCart, item_id: str, quantity: int, now: datetime
+    ) -> None:
+        line = next((line for line in cart.lines if line.id == item_id), None)
+        if not line:
+            raise CartItemNotFoundError()
+
+        if quantity == 0:
+            cart.lines.remove(line)
+            return
+
+        quantity = min(quantity, MAX_LINE_QUANTITY)
+        stock = self.session.exec(
+            select(ProductSize.stock).where(ProductSize.id == line.size_id)
+        ).first()
+        if stock is not None and quantity > stock:
+            raise OutOfStockError()
+        line.quantity = quantity
+
+    def clear_lines(self, cart: MemoryCart) -> None:
+        cart.lines = []
+
+    def save(
+        self, cart: MemoryCart, now: datetime, expected_version: Optional[int] = None
+    ) -> None:
+        with _guest_cart_lock:
+            # The cart is replaced whole, so a write since it was loaded
+            # would be lost; refuse it even without If-Match
+            stored = _guest_carts.get(cart.session_id)
+            if (stored.version if stored else 0) != cart.version:
+                raise PreconditionFailedError("Cart has been modified")
+            cart.version += 1
+            cart.updated_at = now
+            _guest_carts.set(cart.session_id, cart)
+
+    def rows(self, cart: MemoryCart) -> list[tuple]:
+        if not cart.lines:
+            return []
+        sizes = {
+            size_id: (size_label, card)
+            for size_id, size_label, card in self.session.exec(
+                select(ProductSize.id, ProductSize.size, ProductCard).join(
+                    ProductCard, ProductCard.product_id == ProductSize.product_id
+                ).where(ProductSize.id.in_({line.size_id for line in cart.lines}))
+            ).all()
+        }
+        colors = dict(
+            self.session.exec(
+                select(ProductColor.id, ProductColor.name).where(
+                    ProductColor.id.in_({line.color_id for line in cart.lines})
+                )
+            ).all()
+        )
+
+        rows = []
+        for line in cart.lines:
+            if line.size_id not in sizes:
+                continue
+            size_label, card = sizes[line.size_id]
+            rows.append(
+                (
+                    line.id,
+                    line.product_id,
+                    line.color_id,
+                    line.size_id,
+                    line.quantity,
+                    card.slug,
+                    card.name,
+                    card.price,
+                    card.main_image_url,
+                    colors.get(line.color_id),
+                    size_label,
+                )
+            )
+        return rows
+
+    def catalog_stamp(self, cart: MemoryCart) -> Optional[datetime]:
+        if not cart.lines:
+            return None
+        return self.session.exec(
+            select(func.max(ProductCard.refreshed_at)).where(
+                ProductCard.product_id.in_({line.product_id for line in cart.lines})
+            )
+        ).one()
+
+    def cart_version(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Optional[tuple[str, int]]:
+        cart = _guest_carts.get(session_id) if session_id and not user_id else None
+        return (cart.id, cart.version) if cart else None
+
+    def summarize(
+        self, session_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> tuple[int, float]:
+        cart = _guest_carts.get(session_id) if session_id and not user_id else None
+        if not cart or not cart.lines:
+            return 0, 0.0
+        prices = dict(
+            self.session.exec(
+                select(ProductCard.product_id, ProductCard.price).where(
+                    ProductCard.product_id.in_({line.product_id for line in cart.lines})
+                )
+            ).all()
+        )
+        lines = [line for line in cart.lines if line.product_id in prices]
+        return (
+            sum(line.quantity for line in lines),
+            sum(prices[line.product_id] * line.quantity for line in lines),
+        )
+
+    def flush(self, session_id: str) -> None:
+        cart = _guest_carts.get(session_id)
+        if not cart or not cart.lines:
+            return
+
+        sql_cart = SqlCartStore(self.session).get_or_create_cart(session_id=session_id)
+        statement = pg_insert(CartItem).values(
+            [
+                {
+                    "id": line.id,
+                    "cart_id": sql_cart.id,
+                    "product_id": line.product_id,
+                    "color_id": line.color_id,
+                    "size_id": line.size_id,
+                    "quantity": line.quantity,
+                    "created_at": line.created_at,
+                    "updated_at": cart.updated_at,
+                }
+                for line in cart.lines
+            ]
+        )
+        self.session.exec(
+            statement.on_conflict_do_update(
+                index_elements=LINE_COLUMNS,
+                set_={
+                    "quantity": func.least(
+                        CartItem.quantity + statement.excluded.quantity,
+                        MAX_LINE_QUANTITY,
+                    ),
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+        )
+        sql_cart.updated_at = cart.updated_at
+        sql_cart.version += 1
+        # Dropped from memory once this transaction commits
+        self.session.info.setdefault(_FLUSHED_KEY, set()).add(session_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_flushed_guest_carts(session: Session) -> None:
+    for session_id in session.info.pop(_FLUSHED_KEY, ()):
+        _guest_carts.delete(session_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _keep_guest_carts_after_rollback(session: Session) -> None:
+    session.info.pop(_FLUSHED_KEY, None)
+
+
+def guest_cart_store(session: Session) -> CartStore:
+    """The store configured for guest carts by ``GUEST_CART_BACKEND``."""
+    if settings.GUEST_CART_BACKEND == "memory":
+        return MemoryCartStore(session)
+    if settings.GUEST_CART_BACKEND == "unlogged":
+        return UnloggedCartStore(session)
+    if settings.GUEST_CART_BACKEND == "sql":
+        return SqlCartStore(session)
+    raise ValueError(f"Unknown GUEST_CART_BACKEND: {settings.GUEST_CART_BACKEND!r}")
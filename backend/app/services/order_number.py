@@ -0,0 +1,71 @@
+"""Order numbers: ORD-YYYYMMDD- followed by six base-36 digits and a check character.
+
+The digits come from ``order_number_block_seq``. Each process advances it
+once per ORDER_NUMBER_BLOCK_SIZE orders and hands out the numbers of its
+block locally, so numbers are unique across processes without a round trip
+per order. They are scrambled by a fixed multiplier so that consecutive
+orders do not reveal order volume. The check character (Luhn mod 36) catches
+any single mistyped character and most swaps of two adjacent ones.
+"""
+import string
+import threading
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Sequence
+from sqlmodel import Session, SQLModel, select
+
+ALPHABET = string.digits + string.ascii_uppercase
+DIGITS = 6
+# Changing this needs an ALTER SEQUENCE ... INCREMENT BY migration
+ORDER_NUMBER_BLOCK_SIZE = 100
+
+order_number_block_seq = Sequence(
+    "order_number_block_seq",
+    increment=ORDER_NUMBER_BLOCK_SIZE,
+    metadata=SQLModel.metadata,
+)
+
+_SPACE = len(ALPHABET) ** DIGITS
+# Coprime with 36, so multiplying permutes 0 .. 36**6 - 1
+_SCRAMBLE = 5**13
+
+
+class OrderNumberGenerator:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def next(self, session: Session, now: Optional[datetime] = None) -> str:
+        with self._lock:
+            if self._next >= self._end:
+                self._next = session.exec(select(order_number_block_seq.next_value())).one()
+                self._end = self._next + ORDER_NUMBER_BLOCK_SIZE
+            serial = self._next
+            self._next += 1
+
+        code = _encode(serial * _SCRAMBLE % _SPACE)
+        date_str = (now or datetime.utcnow()).strftime("%Y%m%d")
+        return f"ORD-{date_str}-{code}{_check_character(code)}"
+
+
+def _encode(value: int) -> str:
+    digits = []
+    for _ in range(DIGITS):
+        value, digit = divmod(value, len(ALPHABET))
+        digits.append(ALPHABET[digit])
+    return "".join(reversed(digits))
+
+
+def _check_character(code: str) -> str:
+    base = len(ALPHABET)
+    total = 0
+    for position, char in enumerate(reversed(code)):
+        addend = ALPHABET.index(char) * (2 if position % 2 == 0 else 1)
+        total += addend // base + addend % base
+    return ALPHABET[-total % base]
+
+
+# One per process; blocks are not shared between processes
+order_numbers = OrderNumberGenerator()
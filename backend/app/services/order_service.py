@@ -1,19 +1,30 @@
-from sqlmodel import Session, select
+from sqlalchemy import case
+from sqlmodel import Session, delete, func, insert, select, update
 from datetime import datetime
 from uuid import uuid4
-import random
-import string
 from typing import Optional
 
-from app.models import Cart, CartItem, Product, ProductColor, ProductSize
-from app.models.order import Order, OrderItem
+from app.models import (
+    Cart,
+    CartItem,
+    Product,
+    ProductColor,
+    ProductSize,
+    ProductSizeStockSlot,
+)
+from app.models.order import CheckoutTicket, Order, OrderItem
 from app.schemas.order import (
+    CheckoutTicketResponse,
     CreateOrderRequest,
     OrderResponse,
     OrderItemResponse,
     OrderListItem,
 )
-from app.core.exceptions import NotFoundError, BadRequestError
+from app.core.config import settings
+from app.core.exceptions import NotFoundError, BadRequestError, InsufficientStockError
+from app.db.projections import touch_stock
+from app.services.cart_service import CartService, invalidate_cart_summary
+from app.services.order_number import order_numbers
 
 
 class OrderService:
@@ -21,9 +32,7 @@ class OrderService:
         self.session = session
 
     def _generate_order_number(self) -> str:
-        date_str = datetime.utcnow().strftime("%Y%m%d")
-        random_part = "".join(random.choices(string.ascii_uppercase + string.digits, k=4))
-        return f"ORD-{date_str}-{random_part}"
+        return order_numbers.next(self.session)
 
     def _get_cart(
         self, session_id: Optional[str] = None, user_id: Optional[str] = None
@@ -46,12 +55,103 @@ class OrderService:
         session_id: Optional[str] = None,
         user_id: Optional[str] = None,
     ) -> OrderResponse:
+        try:
+            response = self.place_order(request, session_id=session_id, user_id=user_id)
+        except Exception:
+            self.session.rollback()
+            raise
+
+        self.session.commit()
+        invalidate_cart_summary(session_id, user_id)
+
+        return response
+
+    def enqueue_order(
+        self,
+        request: CreateOrderRequest,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> CheckoutTicketResponse:
+        """Queue a checkout for app.jobs.checkout_worker and return its ticket.
+
+        Only the ticket is written here, so the request holds a connection
+        for one short transaction however busy checkout is. A guest cart
+        stays in its store until the worker moves it into the cart tables
+        inside the checkout's savepoint, so a failed checkout leaves it
+        where the guest can still see it.
+        """
+        if not self.queue_available(user_id):
+            raise BadRequestError("目前無法排隊結帳，請直接結帳")
+        ticket = CheckoutTicket(
+            session_id=session_id,
+            user_id=user_id,
+            request=request.model_dump_json(),
+        )
+        self.session.add(ticket)
+        response = self._build_ticket_response(ticket)
+        self.session.commit()
+        return response
+
+    def queue_available(self, user_id: Optional[str] = None) -> bool:
+        """Whether this owner's checkout can go through the queue.
+
+        The queue needs a worker: in-process (CHECKOUT_QUEUE_WORKERS > 0) or
+        a separate one announced by CHECKOUT_QUEUE_ENABLED. Guest carts held
+        in process memory are only visible to in-process workers.
+        """
+        in_process = settings.CHECKOUT_QUEUE_WORKERS > 0
+        if not user_id and settings.GUEST_CART_BACKEND == "memory":
+            return in_process
+        return in_process or settings.CHECKOUT_QUEUE_ENABLED
+
+    def get_ticket(
+        self,
+        ticket_id: str,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> CheckoutTicketResponse:
+        ticket = self.session.exec(
+            select(CheckoutTicket).where(CheckoutTicket.id == ticket_id)
+        ).first()
+        if not ticket or not (
+            (user_id and ticket.user_id == user_id)
+            or (session_id and ticket.session_id == session_id)
+        ):
+            raise NotFoundError("結帳請求不存在")
+
+        position = None
+        if ticket.status == "queued":
+            position = self.session.exec(
+                select(func.count(CheckoutTicket.id)).where(
+                    CheckoutTicket.status == "queued",
+                    CheckoutTicket.created_at < ticket.created_at,
+                )
+            ).one()
+        return self._build_ticket_response(ticket, position)
+
+    def place_order(
+        self,
+        request: CreateOrderRequest,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> OrderResponse:
+        """Turn the cart into an order and reserve its stock, without committing.
+
+        The response is built from the in-memory snapshot, so nothing is read
+        back. Raises BadRequestError for an empty cart and
+        InsufficientStockError when stock is short. Neither commits nor rolls
+        back, so the caller keeps any locks it took until it ends the
+        transaction.
+        """
+        if not user_id:
+            CartService(self.session).flush_guest_cart(session_id)
         cart = self._get_cart(session_id=session_id, user_id=user_id)
         if not cart or not cart.items:
             raise BadRequestError("購物車是空的，無法建立訂單")
 
         # Build order items with product snapshots
         order_items: list[OrderItem] = []
+        sharded_size_ids: set[str] = set()
         items_total = 0.0
 
         for cart_item in cart.items:
@@ -68,6 +168,8 @@ class OrderService:
             size = self.session.exec(
                 select(ProductSize).where(ProductSize.id == cart_item.size_id)
             ).first()
+            if size and size.stock_slots:
+                sharded_size_ids.add(size.id)
 
             main_image = next(
                 (img for img in product.images if img.is_main),
@@ -119,19 +221,165 @@ class OrderService:
         self.session.add(order)
         self.session.flush()
 
+        # One multi-row INSERT for the lines and one DELETE for the cart
         for item in order_items:
             item.order_id = order.id
-            self.session.add(item)
-
-        # Clear cart
-        for cart_item in cart.items:
-            self.session.delete(cart_item)
+        self.session.exec(
+            insert(OrderItem), params=[item.model_dump() for item in order_items]
+        )
+        self.session.exec(delete(CartItem).where(CartItem.cart_id == cart.id))
         cart.updated_at = datetime.utcnow()
+        cart.version += 1
 
-        self.session.commit()
-        self.session.refresh(order)
+        # Last, so the size rows stay locked for as short a time as possible
+        self._reserve_stock(order_items, sharded_size_ids)
 
-        return self._build_order_response(order)
+        return self._build_order_response(order, order_items)
+
+    def _reserve_stock(
+        self, order_items: list[OrderItem], sharded_size_ids: set[str]
+    ) -> None:
+        """Take the ordered quantities out of stock, or fail listing every short line.
+
+        A single conditional UPDATE decrements each size only while
+        ``stock >= quantity``, so concurrent checkouts can never sell more
+        than is on hand. The rows are locked in id order so that checkouts
+        sharing several sizes cannot deadlock each other. Sharded sizes are
+        taken from their stock slots instead.
+        """
+        wanted: dict[str, int] = {}
+        for item in order_items:
+            wanted[item.size_id] = wanted.get(item.size_id, 0) + item.quantity
+
+        short = {
+            size_id
+            for size_id in sorted(sharded_size_ids)
+            if not self._take_from_slots(size_id, wanted[size_id])
+        }
+
+        single = {
+            size_id: quantity
+            for size_id, quantity in wanted.items()
+            if size_id not in sharded_size_ids
+        }
+        reserved = []
+        if single:
+            quantity = case(single, value=ProductSize.id)
+            locked = (
+                select(ProductSize.id)
+                .where(ProductSize.id.in_(single))
+                .order_by(ProductSize.id)
+                .with_for_update()
+            )
+            reserved = self.session.exec(
+                update(ProductSize)
+                .where(
+                    ProductSize.id.in_(locked),
+                    ProductSize.stock_slots == 0,
+                    ProductSize.stock >= quantity,
+                )
+                .values(stock=ProductSize.stock - quantity)
+                .returning(ProductSize.id, ProductSize.product_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            short |= set(single) - {size_id for size_id, _ in reserved}
+
+        if short:
+            raise InsufficientStockError(
+                self._short_stock_message(
+                    [item for item in order_items if item.size_id in short], wanted
+                )
+            )
+
+        # Stock feeds the in_stock flag on product cards and the detail cache;
+        # sharded sizes are refreshed when their slots are reconciled
+        if reserved:
+            touch_stock(self.session, {product_id for _, product_id in reserved})
+
+    def _take_from_slots(self, size_id: str, quantity: int) -> bool:
+        """Take ``quantity`` units of a sharded size from its stock slots.
+
+        Each buyer decrements one random slot that has enough stock, skipping
+        slots other checkouts hold, so concurrent buyers rarely wait on each
+        other. When no single free slot is enough, all the size's slots are
+        locked and the units are taken from as many as needed.
+        """
+        slots = ProductSizeStockSlot
+        free_slot = (
+            select(slots.slot)
+            .where(slots.size_id == size_id, slots.stock >= quantity)
+            .order_by(func.random())
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        taken = self.session.exec(
+            update(slots)
+            .where(
+                slots.size_id == size_id,
+                slots.slot == free_slot,
+                slots.stock >= quantity,
+            )
+            .values(stock=slots.stock - quantity)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if taken:
+            return True
+
+        stocks = self.session.exec(
+            select(slots.slot, slots.stock)
+            .where(slots.size_id == size_id, slots.stock > 0)
+            .order_by(slots.slot)
+            .with_for_update()
+        ).all()
+        if sum(stock for _, stock in stocks) < quantity:
+            return False
+        take: dict[int, int] = {}
+        for slot, stock in stocks:
+            take[slot] = min(stock, quantity - sum(take.values()))
+            if sum(take.values()) == quantity:
+                break
+        self.session.exec(
+            update(slots)
+            .where(slots.size_id == size_id, slots.slot.in_(take))
+            .values(stock=slots.stock - case(take, value=slots.slot))
+            .execution_options(synchronize_session=False)
+        )
+        return True
+
+    def _short_stock_message(
+        self, short_items: list[OrderItem], wanted: dict[str, int]
+    ) -> str:
+        size_ids = {item.size_id for item in short_items}
+        available = dict(
+            self.session.exec(
+                select(ProductSize.id, ProductSize.stock).where(
+                    ProductSize.id.in_(size_ids)
+                )
+            ).all()
+        )
+        # The stock of sharded sizes is in their slots
+        available.update(
+            self.session.exec(
+                select(
+                    ProductSizeStockSlot.size_id, func.sum(ProductSizeStockSlot.stock)
+                )
+                .where(ProductSizeStockSlot.size_id.in_(size_ids))
+                .group_by(ProductSizeStockSlot.size_id)
+            ).all()
+        )
+        lines = []
+        seen: set[str] = set()
+        for item in short_items:
+            # One entry per size even if several colors of it were ordered
+            if item.size_id in seen:
+                continue
+            seen.add(item.size_id)
+            lines.append(
+                f"{item.product_name} {item.size}（需要 {wanted[item.size_id]} 件，"
+                f"剩餘 {max(available.get(item.size_id, 0), 0)} 件）"
+            )
+        return "以下商品庫存不足：" + "、".join(lines)
 
     def get_orders(self, user_id: str) -> list[OrderListItem]:
         orders = self.session.exec(
@@ -185,7 +433,22 @@ class OrderService:
 
         return self._build_order_response(order)
 
-    def _build_order_response(self, order: Order) -> OrderResponse:
+    def _build_ticket_response(
+        self, ticket: CheckoutTicket, position: Optional[int] = None
+    ) -> CheckoutTicketResponse:
+        return CheckoutTicketResponse(
+            id=ticket.id,
+            status=ticket.status,
+            orderId=ticket.order_id,
+            error=ticket.error,
+            queuePosition=position,
+            createdAt=ticket.created_at,
+            updatedAt=ticket.updated_at,
+        )
+
+    def _build_order_response(
+        self, order: Order, order_items: Optional[list[OrderItem]] = None
+    ) -> OrderResponse:
         items = [
             OrderItemResponse(
                 id=item.id,
@@ -200,7 +463,7 @@ class OrderService:
                 price=item.price,
                 quantity=item.quantity,
             )
-            for item in order.items
+            for item in (order.items if order_items is None else order_items)
         ]
 
         return OrderResponse(
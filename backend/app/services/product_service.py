@@ -1,7 +1,68 @@
-from sqlmodel import Session, select
-from app.models import Product, ProductImage, ProductColor, ProductSize
-from app.schemas import ProductResponse, ProductListItemResponse
-from app.core.exceptions import ProductNotFoundError
+import base64
+import binascii
+import json
+import re
+from datetime import datetime
+
+from sqlalchemy import Integer, String, cast, literal, or_, tuple_, union_all
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, func, select
+from app.models import CatalogVersion, Product, ProductCard, ProductSearchGram, ProductSize
+from app.schemas import (
+    FacetCount,
+    PriceBucket,
+    ProductFacetsResponse,
+    ProductListItemResponse,
+    ProductResponse,
+)
+from app.core.cache import LRUBytesCache, TTLCache
+from app.core.config import settings
+from app.core.exceptions import BadRequestError, ProductNotFoundError
+from app.core.search import query_grams
+from app.db.projections import on_catalog_change
+
+_facet_cache = TTLCache(maxsize=512, ttl=settings.PRODUCT_FACET_CACHE_TTL)
+# Facets count categories, prices and the sizes still in stock
+on_catalog_change(lambda product_ids: _facet_cache.clear(), kinds=("catalog", "stock"))
+
+# Encoded ProductResponse bodies keyed by product id
+_detail_cache = LRUBytesCache(max_bytes=settings.PRODUCT_DETAIL_CACHE_BYTES)
+
+
+def _evict_details(product_ids: set[str]) -> None:
+    for product_id in product_ids:
+        _detail_cache.delete(product_id)
+
+
+on_catalog_change(_evict_details)
+
+
+def _encode_cursor(sort: str, key, product_id: str) -> str:
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    payload = json.dumps({"s": sort, "k": key, "id": product_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str, sort_key) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["s"] != sort:
+            raise ValueError("cursor was issued for a different sort")
+        key = payload["k"]
+        if sort_key is ProductCard.created_at:
+            key = datetime.fromisoformat(key)
+        else:
+            key = float(key)
+        return key, str(payload["id"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise BadRequestError("Invalid cursor")
+
+
+def _natural_key(value: str) -> list:
+    """Sort "US 9.5" before "US 10"."""
+    return [float(part) if part[:1].isdigit() else part for part in re.split(r"(\d+(?:\.\d+)?)", value)]
 
 
 class ProductService:
@@ -15,63 +76,313 @@ class ProductService:
         page_size: int = 24,
         search: str | None = None,
         sort: str | None = None,
+        count_cap: int | None = None,
     ) -> tuple[list[ProductListItemResponse], int]:
-        query = select(Product)
+        matches = self._search_matches(search)
+        conditions = self._filter_conditions(category)
+        sort_key, descending = self._sort_key(self._resolve_sort(sort, matches), matches)
+        order_by = self._order_by(sort_key, descending)
 
-        if category:
-            query = query.where(Product.category == category)
+        offset = (page - 1) * page_size
+
+        if count_cap is None:
+            # The window count is evaluated before OFFSET/LIMIT, so the page
+            # and the total come back from the same statement.
+            query = self._join_matches(
+                select(ProductCard, func.count().over().label("total")), matches
+            )
+            query = query.where(*conditions).order_by(*order_by).offset(offset).limit(page_size)
+            rows = self.session.exec(query).all()
+            cards = [row[0] for row in rows]
+            if rows:
+                total = rows[0][1]
+            elif offset:
+                # Past the last page there is no row to carry the count
+                total = self._count_products(conditions, matches)
+            else:
+                total = 0
+        else:
+            query = self._join_matches(select(ProductCard), matches)
+            query = query.where(*conditions).order_by(*order_by).offset(offset).limit(page_size)
+            cards = self.session.exec(query).all()
+            total = self._count_products(conditions, matches, cap=count_cap)
 
-        if search:
-            query = query.where(Product.name.ilike(f"%{search}%"))
+        return [self._build_list_item(card) for card in cards], total
 
-        # Get total count
-        total = len(self.session.exec(query).all())
+    def get_products_by_cursor(
+        self,
+        category: str | None = None,
+        page_size: int = 24,
+        search: str | None = None,
+        sort: str | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[ProductListItemResponse], str | None]:
+        """Keyset pagination: seek past ``(sort_key, id)`` of the previous page."""
+        matches = self._search_matches(search)
+        conditions = self._filter_conditions(category)
+        sort = self._resolve_sort(sort, matches)
+        sort_key, descending = self._sort_key(sort, matches)
 
-        # Apply sorting
-        if sort == "price-asc":
-            query = query.order_by(Product.price.asc())
-        elif sort == "price-desc":
-            query = query.order_by(Product.price.desc())
-        else:
-            query = query.order_by(Product.created_at.desc())
+        if cursor:
+            last_key, last_id = _decode_cursor(cursor, sort, sort_key)
+            position = tuple_(sort_key, ProductCard.product_id)
+            if descending:
+                conditions.append(position < tuple_(last_key, last_id))
+            else:
+                conditions.append(position > tuple_(last_key, last_id))
 
-        # Apply pagination
-        offset = (page - 1) * page_size
-        query = query.offset(offset).limit(page_size)
+        query = self._join_matches(select(ProductCard, sort_key), matches)
+        query = (
+            query.where(*conditions)
+            .order_by(*self._order_by(sort_key, descending))
+            .limit(page_size + 1)
+        )
+        rows = self.session.exec(query).all()
 
-        products = self.session.exec(query).all()
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last, last_key = rows[-1]
+            next_cursor = _encode_cursor(sort, last_key, last.product_id)
 
-        result = []
-        for product in products:
-            # Get main image
-            main_image = next(
-                (img for img in product.images if img.is_main),
-                product.images[0] if product.images else None,
+        return [self._build_list_item(card) for card, _ in rows], next_cursor
+
+    def get_facets(
+        self, category: str | None = None, search: str | None = None
+    ) -> ProductFacetsResponse:
+        cache_key = (category, search)
+        cached = _facet_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        matches = self._search_matches(search)
+        conditions = self._filter_conditions(category)
+        bucket_width = settings.PRODUCT_FACET_PRICE_BUCKET
+
+        # Category counts ignore the category filter so the sidebar can
+        # offer the other categories for the same search.
+        categories = self._join_matches(
+            select(
+                literal("category").label("facet"),
+                ProductCard.category.label("value"),
+                func.count().label("count"),
+            ).select_from(ProductCard),
+            matches,
+        ).group_by(ProductCard.category)
+
+        bucket = cast(func.floor(ProductCard.price / bucket_width), Integer) * bucket_width
+        prices = (
+            self._join_matches(
+                select(
+                    literal("price").label("facet"),
+                    cast(bucket, String).label("value"),
+                    func.count().label("count"),
+                ).select_from(ProductCard),
+                matches,
             )
+            .where(*conditions)
+            .group_by(bucket)
+        )
 
-            result.append(
-                ProductListItemResponse(
-                    id=product.id,
-                    slug=product.slug,
-                    name=product.name,
-                    subtitle=product.subtitle,
-                    price=product.price,
-                    originalPrice=product.original_price,
-                    category=product.category,
-                    imageUrl=main_image.url if main_image else "",
-                    colorCount=len(product.colors),
+        sizes = (
+            self._join_matches(
+                select(
+                    literal("size").label("facet"),
+                    ProductSize.size.label("value"),
+                    func.count(func.distinct(ProductSize.product_id)).label("count"),
                 )
+                .select_from(ProductCard)
+                .join(ProductSize, ProductSize.product_id == ProductCard.product_id),
+                matches,
+            )
+            .where(*conditions, ProductSize.stock > 0)
+            .group_by(ProductSize.size)
+        )
+
+        rows = self.session.exec(union_all(categories, prices, sizes)).all()
+
+        facets = ProductFacetsResponse(
+            categories=sorted(
+                (FacetCount(value=value, count=count) for facet, value, count in rows if facet == "category"),
+                key=lambda f: (-f.count, f.value),
+            ),
+            priceBuckets=sorted(
+                (
+                    PriceBucket(min=float(value), max=float(value) + bucket_width, count=count)
+                    for facet, value, count in rows
+                    if facet == "price"
+                ),
+                key=lambda b: b.min,
+            ),
+            sizes=sorted(
+                (FacetCount(value=value, count=count) for facet, value, count in rows if facet == "size"),
+                key=lambda f: _natural_key(f.value),
+            ),
+        )
+        _facet_cache.set(cache_key, facets)
+        return facets
+
+    def _search_matches(self, search: str | None):
+        """Products containing every gram of ``search``, with a relevance rank."""
+        if not search:
+            return None
+
+        grams = query_grams(search)
+        # A search without indexable text (e.g. only punctuation) matches nothing
+        return (
+            select(
+                ProductSearchGram.product_id,
+                func.sum(ProductSearchGram.weight).label("rank"),
+            )
+            .where(ProductSearchGram.gram.in_(grams))
+            .group_by(ProductSearchGram.product_id)
+            .having(func.count() == len(grams))
+            .subquery()
+        )
+
+    def _join_matches(self, query, matches):
+        if matches is None:
+            return query
+        return query.join(matches, matches.c.product_id == ProductCard.product_id)
+
+    def _filter_conditions(self, category: str | None) -> list:
+        conditions = []
+
+        if category:
+            conditions.append(ProductCard.category == category)
+
+        return conditions
+
+    def _resolve_sort(self, sort: str | None, matches) -> str:
+        if sort:
+            return sort
+        return "relevance" if matches is not None else "newest"
+
+    def _sort_key(self, sort: str, matches):
+        if sort == "price-asc":
+            return ProductCard.price, False
+        if sort == "price-desc":
+            return ProductCard.price, True
+        if sort == "relevance" and matches is not None:
+            return matches.c.rank, True
+        return ProductCard.created_at, True
+
+    def _order_by(self, sort_key, descending: bool) -> list:
+        # id breaks ties so every row has a unique, stable position
+        if descending:
+            return [sort_key.desc(), ProductCard.product_id.desc()]
+        return [sort_key.asc(), ProductCard.product_id.asc()]
+
+    def _build_list_item(self, card: ProductCard) -> ProductListItemResponse:
+        return ProductListItemResponse(
+            id=card.product_id,
+            slug=card.slug,
+            name=card.name,
+            subtitle=card.subtitle,
+            price=card.price,
+            originalPrice=card.original_price,
+            category=card.category,
+            imageUrl=card.main_image_url,
+            colorCount=card.color_count,
+        )
+
+    def _count_products(
+        self, conditions: list, matches=None, cap: int | None = None
+    ) -> int:
+        """Count matching products in the database.
+
+        With ``cap``, counting stops after ``cap + 1`` rows, so a result above
+        ``cap`` means there are more than ``cap`` products.
+        """
+        if cap is None:
+            query = self._join_matches(
+                select(func.count()).select_from(ProductCard), matches
+            ).where(*conditions)
+        else:
+            matching = (
+                self._join_matches(select(ProductCard.product_id), matches)
+                .where(*conditions)
+                .limit(cap + 1)
+                .subquery()
             )
+            query = select(func.count()).select_from(matching)
+        return self.session.exec(query).one()
 
-        return result, total
+    def get_catalog_version(self) -> tuple[datetime | None, int]:
+        """Time and number of the latest catalog change; bumped on every write."""
+        row = self.session.exec(
+            select(CatalogVersion.updated_at, CatalogVersion.version)
+        ).first()
+        return tuple(row) if row else (None, 0)
+
+    def get_product_version(self, slug: str) -> tuple[str, datetime] | None:
+        return self.session.exec(
+            select(ProductCard.product_id, ProductCard.refreshed_at).where(
+                ProductCard.slug == slug
+            )
+        ).first()
 
     def get_product_by_slug(self, slug: str) -> ProductResponse:
-        query = select(Product).where(Product.slug == slug)
+        query = self._detail_query().where(Product.slug == slug)
         product = self.session.exec(query).first()
 
         if not product:
             raise ProductNotFoundError()
 
+        return self._build_product_response(product)
+
+    def get_product_json(self, product_id: str, version: datetime) -> bytes:
+        """Encoded ProductResponse, reused while the product's card version holds.
+
+        ``version`` is the card's ``refreshed_at`` from get_product_version(),
+        so entries written by another worker before a change are never served.
+        """
+        payload = _detail_cache.get(product_id, version)
+        if payload is None:
+            query = self._detail_query().where(Product.id == product_id)
+            product = self.session.exec(query).first()
+            if not product:
+                raise ProductNotFoundError()
+            payload = self._build_product_response(product).model_dump_json().encode()
+            _detail_cache.set(product_id, version, payload)
+        return payload
+
+    def get_products_batch(
+        self, ids: list[str], slugs: list[str]
+    ) -> list[ProductResponse]:
+        """Products for the given ids/slugs in request order; unknown keys are skipped."""
+        if len(ids) + len(slugs) > settings.PRODUCT_BATCH_MAX:
+            raise BadRequestError(
+                f"At most {settings.PRODUCT_BATCH_MAX} products can be requested at once"
+            )
+        if not ids and not slugs:
+            return []
+
+        query = self._detail_query().where(
+            or_(Product.id.in_(ids), Product.slug.in_(slugs))
+        )
+        products = self.session.exec(query).all()
+        by_key = {product.id: product for product in products}
+        by_key.update({product.slug: product for product in products})
+
+        result = []
+        seen: set[str] = set()
+        for key in [*ids, *slugs]:
+            product = by_key.get(key)
+            if product and product.id not in seen:
+                seen.add(product.id)
+                result.append(self._build_product_response(product))
+        return result
+
+    def _detail_query(self):
+        # One statement per relationship instead of one per product
+        return select(Product).options(
+            selectinload(Product.images),
+            selectinload(Product.colors),
+            selectinload(Product.sizes),
+        )
+
+    def _build_product_response(self, product: Product) -> ProductResponse:
         return ProductResponse(
             id=product.id,
             slug=product.slug,
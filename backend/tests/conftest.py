@@ -0,0 +1,97 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlmodel import Session, SQLModel
+
+import app.models  # noqa: F401  (registers the tables on SQLModel.metadata)
+from app.db.session import get_session
+from app.main import app
+from app.models import Product, ProductColor, ProductImage, ProductSize
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def pg_engine():
+    """Scratch PostgreSQL database from TEST_DATABASE_URL, for concurrency tests.
+
+    Skipped when the variable is unset. Every table in it is dropped and
+    recreated.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(url, pool_size=16, max_overflow=0)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def statements(engine):
+    """SQL statements sent to the database while the test runs."""
+    sent: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda *args: sent.append(args[2]))
+    return sent
+
+
+@pytest.fixture
+def client(engine):
+    def override_get_session():
+        with Session(engine) as session:
+            yield session
+
+    # Without a `with` block the lifespan (schema setup, seeding) does not run
+    app.dependency_overrides[get_session] = override_get_session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def make_product(session):
+    """Create a product with images, colors and sizes; returns the Product."""
+    created = 0
+
+    def make(name: str | None = None, price: float = 1000, stock: int = 5, **fields) -> Product:
+        nonlocal created
+        created += 1
+        product = Product(
+            slug=f"product-{created}",
+            name=name or f"Product {created}",
+            subtitle=fields.pop("subtitle", "男鞋"),
+            description=fields.pop("description", f"Description {created}"),
+            price=price,
+            category=fields.pop("category", "男鞋"),
+            **fields,
+        )
+        session.add(product)
+        session.flush()
+        session.add_all(
+            [
+                ProductImage(product_id=product.id, url=f"https://img/{created}/0", alt="", is_main=True),
+                ProductImage(product_id=product.id, url=f"https://img/{created}/1", alt="", sort_order=1),
+                ProductColor(product_id=product.id, name="Black", code="#000000", image_url=""),
+                ProductColor(product_id=product.id, name="White", code="#ffffff", image_url="", sort_order=1),
+                ProductSize(product_id=product.id, size="US 8", stock=stock),
+                ProductSize(product_id=product.id, size="US 9", stock=stock, sort_order=1),
+            ]
+        )
+        session.commit()
+        return product
+
+    return make
@@ -0,0 +1,53 @@
+import pytest
+
+from app.models import Cart, CartItem
+
+HEADERS = {"X-Session-Id": "guest"}
+
+
+@pytest.fixture
+def cart_product(session, make_product):
+    product = make_product(price=1000)
+    cart = Cart(session_id="guest", version=1)
+    session.add(cart)
+    session.flush()
+    session.add(
+        CartItem(
+            cart_id=cart.id,
+            product_id=product.id,
+            color_id=product.colors[0].id,
+            size_id=product.sizes[0].id,
+            quantity=2,
+        )
+    )
+    session.commit()
+    return product
+
+
+def test_cart_etag_changes_when_a_product_price_changes(client, session, cart_product):
+    etag = client.get("/api/v1/cart", headers=HEADERS).headers["etag"]
+    assert client.get("/api/v1/cart", headers={**HEADERS, "If-None-Match": etag}).status_code == 304
+
+    cart_product.price = 800
+    session.commit()
+
+    response = client.get("/api/v1/cart", headers={**HEADERS, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["items"][0]["price"] == 800
+
+
+def test_if_match_ignores_the_catalog_part_of_the_etag(client, session, cart_product):
+    cart = client.get("/api/v1/cart", headers=HEADERS)
+    etag = cart.headers["etag"]
+    cart_product.price = 800
+    session.commit()
+
+    response = client.delete(
+        f"/api/v1/cart/items/{cart.json()['items'][0]['id']}",
+        headers={**HEADERS, "If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+    stale = client.delete("/api/v1/cart", headers={**HEADERS, "If-Match": etag})
+    assert stale.status_code == 412
@@ -0,0 +1,39 @@
+from sqlmodel import Session, select
+
+from app.models import Cart, CartItem, Product, User
+from app.services.cart_service import CartService
+
+GUEST_LINES = 150
+
+
+def test_login_merge_carries_every_guest_line(pg_engine):
+    with Session(pg_engine) as session:
+        product = Product(
+            slug="merge-sku", name="Merge SKU", subtitle="", description="", price=1000, category="男鞋"
+        )
+        user = User(email="merge@example.com", password_hash="x", first_name="M", last_name="G")
+        session.add_all([product, user])
+        session.flush()
+        guest = Cart(session_id="guest", version=1)
+        mine = Cart(user_id=user.id, version=1)
+        session.add_all([guest, mine])
+        session.flush()
+        session.add_all(
+            CartItem(cart_id=guest.id, product_id=product.id, color_id="c", size_id=f"s{n}", quantity=4)
+            for n in range(GUEST_LINES)
+        )
+        session.add(CartItem(cart_id=mine.id, product_id=product.id, color_id="c", size_id="s0", quantity=8))
+        session.commit()
+        user_id = user.id
+
+        merged = CartService(session).merge_guest_cart("guest", user_id)
+
+        lines = session.exec(
+            select(CartItem.size_id, CartItem.quantity)
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .where(Cart.user_id == user_id)
+        ).all()
+        assert merged == GUEST_LINES
+        assert len(lines) == GUEST_LINES
+        assert dict(lines)["s0"] == 10
+        assert session.exec(select(Cart).where(Cart.session_id == "guest")).first() is None
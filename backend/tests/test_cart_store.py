@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.exceptions import PreconditionFailedError
+from app.schemas import AddToCartRequest
+from app.services.cart_store import CartStore, MemoryCartStore
+
+
+def test_cart_store_is_abstract(session):
+    with pytest.raises(TypeError):
+        CartStore(session)
+
+
+def test_memory_store_refuses_to_overwrite_a_newer_cart(session, make_product):
+    product = make_product()
+    store = MemoryCartStore(session)
+
+    def add(cart, size):
+        store.add_line(
+            cart,
+            AddToCartRequest(
+                productId=product.id, colorId=product.colors[0].id, sizeId=size.id, quantity=1
+            ),
+            datetime.utcnow(),
+        )
+
+    first = store.get_or_create_cart(session_id="racing")
+    second = store.get_or_create_cart(session_id="racing")
+    add(first, product.sizes[0])
+    add(second, product.sizes[1])
+
+    store.save(first, datetime.utcnow())
+    with pytest.raises(PreconditionFailedError):
+        store.save(second, datetime.utcnow())
+
+    stored = store.find_cart(session_id="racing")
+    assert [line.size_id for line in stored.lines] == [product.sizes[0].id]
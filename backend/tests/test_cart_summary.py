@@ -0,0 +1,32 @@
+from sqlmodel import delete, update
+
+from app.models import Cart, CartItem
+from app.services.cart_service import CartService
+
+
+def test_summary_cache_sees_writes_from_other_processes(session, make_product):
+    product = make_product(price=1000)
+    cart = Cart(session_id="badge", version=1)
+    session.add(cart)
+    session.flush()
+    session.add(
+        CartItem(
+            cart_id=cart.id,
+            product_id=product.id,
+            color_id=product.colors[0].id,
+            size_id=product.sizes[0].id,
+            quantity=3,
+        )
+    )
+    session.commit()
+    service = CartService(session)
+    assert service.get_summary(session_id="badge").itemCount == 3
+
+    # What a checkout worker in another process does, without touching
+    # this process's cache
+    session.exec(delete(CartItem).where(CartItem.cart_id == cart.id))
+    session.exec(update(Cart).where(Cart.id == cart.id).values(version=Cart.version + 1))
+    session.commit()
+
+    summary = service.get_summary(session_id="badge")
+    assert (summary.itemCount, summary.subtotal) == (0, 0)
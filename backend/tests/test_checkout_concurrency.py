@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlmodel import Session, func, select
+
+from app.core.exceptions import InsufficientStockError
+from app.jobs.stock_shards import reconcile_stock, shard_stock
+from app.models import Cart, CartItem, Product, ProductColor, ProductSize
+from app.models.order import Order, OrderItem
+from app.schemas.order import CreateOrderRequest
+from app.services.order_service import OrderService
+
+STOCK = 25
+BUYERS = 40
+
+REQUEST = CreateOrderRequest(
+    recipient_name="Concurrency Test",
+    recipient_phone="0900000000",
+    shipping_address="Test Road 1",
+)
+
+
+def _seed(engine) -> str:
+    """One size with STOCK units and BUYERS guest carts holding one each."""
+    with Session(engine) as session:
+        product = Product(
+            slug="hot-sku", name="Hot SKU", subtitle="男鞋", description="", price=1000, category="男鞋"
+        )
+        session.add(product)
+        session.flush()
+        color = ProductColor(product_id=product.id, name="Black", code="#000000", image_url="")
+        size = ProductSize(product_id=product.id, size="US 9", stock=STOCK)
+        session.add_all([color, size])
+        session.flush()
+        for buyer in range(BUYERS):
+            cart = Cart(session_id=f"buyer-{buyer}", version=1)
+            session.add(cart)
+            session.flush()
+            session.add(
+                CartItem(
+                    cart_id=cart.id,
+                    product_id=product.id,
+                    color_id=color.id,
+                    size_id=size.id,
+                    quantity=1,
+                )
+            )
+        session.commit()
+        return size.id
+
+
+def _checkout(engine, buyer: int) -> str:
+    with Session(engine) as session:
+        try:
+            OrderService(session).create_order(REQUEST, session_id=f"buyer-{buyer}")
+        except InsufficientStockError:
+            return "short"
+    return "ok"
+
+
+@pytest.mark.parametrize("slots", [0, 4], ids=["one-row", "sharded"])
+def test_parallel_checkouts_sell_exactly_the_stock(pg_engine, slots):
+    size_id = _seed(pg_engine)
+    if slots:
+        with Session(pg_engine) as session:
+            shard_stock(session, size_id, slots)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        outcomes = list(pool.map(lambda buyer: _checkout(pg_engine, buyer), range(BUYERS)))
+
+    with Session(pg_engine) as session:
+        reconcile_stock(session)
+        stock = session.exec(select(ProductSize.stock).where(ProductSize.id == size_id)).one()
+        orders = session.exec(select(func.count(Order.id))).one()
+        units = session.exec(select(func.sum(OrderItem.quantity))).one()
+
+    assert outcomes.count("ok") == STOCK
+    assert outcomes.count("short") == BUYERS - STOCK
+    assert stock == 0
+    assert orders == units == STOCK
@@ -0,0 +1,69 @@
+import pytest
+from sqlmodel import Session, select, update
+
+from app.core.exceptions import BadRequestError
+from app.jobs.checkout_worker import process_next_ticket
+from app.models import Cart, CheckoutTicket, GuestCart, GuestCartItem, Product, ProductColor, ProductSize
+from app.schemas.order import CreateOrderRequest
+from app.services.order_service import OrderService
+
+REQUEST = CreateOrderRequest(
+    recipient_name="Queue Test",
+    recipient_phone="0900000000",
+    shipping_address="Test Road 1",
+)
+
+
+def test_checkout_is_synchronous_unless_a_worker_is_announced(client, monkeypatch):
+    assert client.get("/api/v1/orders/checkout-mode").json() == {"queue": False}
+    response = client.post("/api/v1/orders/queue", json=REQUEST.model_dump())
+    assert response.status_code == 400
+
+    monkeypatch.setattr("app.services.order_service.settings.CHECKOUT_QUEUE_ENABLED", True)
+    assert client.get("/api/v1/orders/checkout-mode").json() == {"queue": True}
+
+
+def test_memory_guest_carts_cannot_be_queued_to_another_process(session, monkeypatch):
+    monkeypatch.setattr("app.services.order_service.settings.GUEST_CART_BACKEND", "memory")
+    monkeypatch.setattr("app.services.order_service.settings.CHECKOUT_QUEUE_ENABLED", True)
+    monkeypatch.setattr("app.services.order_service.settings.CHECKOUT_QUEUE_WORKERS", 0)
+
+    with pytest.raises(BadRequestError):
+        OrderService(session).enqueue_order(REQUEST, session_id="guest")
+    assert OrderService(session).queue_available(user_id="someone")
+
+
+def test_failed_ticket_leaves_the_guest_cart_in_place(pg_engine, monkeypatch):
+    monkeypatch.setattr("app.services.cart_store.settings.GUEST_CART_BACKEND", "unlogged")
+    monkeypatch.setattr("app.services.order_service.settings.CHECKOUT_QUEUE_ENABLED", True)
+    with Session(pg_engine) as session:
+        product = Product(
+            slug="queued-sku", name="Queued SKU", subtitle="", description="", price=1000, category="男鞋"
+        )
+        session.add(product)
+        session.flush()
+        color = ProductColor(product_id=product.id, name="Black", code="#000000", image_url="")
+        size = ProductSize(product_id=product.id, size="US 9", stock=5)
+        guest = GuestCart(session_id="guest", version=1)
+        session.add_all([color, size, guest])
+        session.flush()
+        session.add(
+            GuestCartItem(
+                cart_id=guest.id, product_id=product.id, color_id=color.id, size_id=size.id, quantity=3
+            )
+        )
+        session.commit()
+
+        ticket = OrderService(session).enqueue_order(REQUEST, session_id="guest")
+        # Sold elsewhere while the ticket waited
+        session.exec(update(ProductSize).where(ProductSize.id == size.id).values(stock=1))
+        session.commit()
+
+    with Session(pg_engine) as session:
+        assert process_next_ticket(session)
+
+        failed = session.get(CheckoutTicket, ticket.id)
+        assert failed.status == "failed"
+        assert "庫存不足" in failed.error
+        assert session.exec(select(GuestCartItem.quantity)).all() == [3]
+        assert session.exec(select(Cart)).all() == []
@@ -0,0 +1,97 @@
+import re
+from datetime import datetime
+
+import pytest
+
+from app.services.order_number import (
+    ALPHABET,
+    DIGITS,
+    ORDER_NUMBER_BLOCK_SIZE,
+    OrderNumberGenerator,
+    _SCRAMBLE,
+    _SPACE,
+    _check_character,
+    _encode,
+)
+
+
+class _BlockSequence:
+    """Stands in for the session; hands out block starts like the sequence."""
+
+    def __init__(self, start: int = 1) -> None:
+        self.calls = 0
+        self._value = start - ORDER_NUMBER_BLOCK_SIZE
+
+    def exec(self, statement):
+        self.calls += 1
+        self._value += ORDER_NUMBER_BLOCK_SIZE
+        return self
+
+    def one(self) -> int:
+        return self._value
+
+
+def _serial(number: str) -> int:
+    """Undo the scramble of an order number's digits."""
+    code = number.split("-")[-1][:DIGITS]
+    value = 0
+    for char in code:
+        value = value * len(ALPHABET) + ALPHABET.index(char)
+    return value * pow(_SCRAMBLE, -1, _SPACE) % _SPACE
+
+
+def test_format():
+    number = OrderNumberGenerator().next(_BlockSequence(), now=datetime(2026, 10, 18, 23, 59))
+
+    assert re.fullmatch(rf"ORD-20261018-[0-9A-Z]{{{DIGITS + 1}}}", number)
+    code = number[-DIGITS - 1:-1]
+    assert number[-1] == _check_character(code)
+
+
+@pytest.mark.parametrize("code", ["000000", "000001", "ZZZZZZ", "7K3Q0B", "A1B2C3"])
+def test_check_character_catches_any_single_substitution(code):
+    check = _check_character(code)
+    for position in range(DIGITS):
+        for char in ALPHABET:
+            if char == code[position]:
+                continue
+            typo = code[:position] + char + code[position + 1:]
+            assert _check_character(typo) != check, typo
+
+
+def test_check_character_catches_adjacent_swaps():
+    codes = [_encode(n * 7919 % _SPACE) for n in range(500)] + ["0Z0000", "A0ZB12"]
+    for code in codes:
+        check = _check_character(code)
+        for position in range(DIGITS - 1):
+            a, b = code[position], code[position + 1]
+            swapped = code[:position] + b + a + code[position + 2:]
+            # Like Luhn mod 10 missing 09 <-> 90, swapping "0" and "Z" goes unnoticed
+            if a == b or {a, b} == {"0", "Z"}:
+                assert _check_character(swapped) == check
+            else:
+                assert _check_character(swapped) != check, swapped
+
+
+def test_scramble_is_a_bijection():
+    sample = range(0, _SPACE, 9973)
+    codes = {_encode(serial * _SCRAMBLE % _SPACE) for serial in sample}
+
+    assert len(codes) == len(sample)
+    assert all(len(code) == DIGITS for code in codes)
+    # Consecutive serials do not give consecutive codes
+    assert _encode(_SCRAMBLE % _SPACE) != _encode(1)
+
+
+def test_new_block_is_allocated_when_the_block_is_used_up():
+    sequence = _BlockSequence(start=1)
+    generator = OrderNumberGenerator()
+
+    first_block = [generator.next(sequence) for _ in range(ORDER_NUMBER_BLOCK_SIZE)]
+    assert sequence.calls == 1
+    assert [_serial(n) for n in first_block] == list(range(1, ORDER_NUMBER_BLOCK_SIZE + 1))
+
+    number = generator.next(sequence)
+    assert sequence.calls == 2
+    assert _serial(number) == 1 + ORDER_NUMBER_BLOCK_SIZE
+    assert len(set(first_block + [number])) == ORDER_NUMBER_BLOCK_SIZE + 1
@@ -0,0 +1,135 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import ProductColor, ProductImage, ProductSize
+from app.services.product_service import ProductService
+
+PRODUCTS = 6
+
+
+@pytest.fixture
+def catalog(make_product):
+    return [make_product(name=f"Air Runner {n}", price=1000 + n) for n in range(PRODUCTS)]
+
+
+def _count_statements(session, statements, call) -> int:
+    session.expire_all()
+    statements.clear()
+    call()
+    return len(statements)
+
+
+@pytest.mark.parametrize(
+    "listing",
+    [
+        pytest.param(lambda service, size: service.get_products(page_size=size), id="offset"),
+        pytest.param(
+            lambda service, size: service.get_products(page_size=size, count_cap=100),
+            id="offset-capped",
+        ),
+        pytest.param(
+            lambda service, size: service.get_products(page_size=size, search="runner"),
+            id="search",
+        ),
+        pytest.param(
+            lambda service, size: service.get_products(page_size=size, sort="price-asc"),
+            id="price-sort",
+        ),
+        pytest.param(
+            lambda service, size: service.get_products_by_cursor(page_size=size),
+            id="cursor",
+        ),
+    ],
+)
+def test_listing_query_count_does_not_depend_on_page_size(session, statements, catalog, listing):
+    service = ProductService(session)
+
+    one = _count_statements(session, statements, lambda: listing(service, 1))
+    full = _count_statements(session, statements, lambda: listing(service, PRODUCTS))
+
+    assert one == full
+
+
+def _add_variants(session, product, count: int) -> None:
+    for n in range(count):
+        session.add_all(
+            [
+                ProductImage(product_id=product.id, url=f"https://img/extra/{n}", alt="", sort_order=2 + n),
+                ProductColor(product_id=product.id, name=f"Color {n}", code="#123456", image_url="", sort_order=2 + n),
+                ProductSize(product_id=product.id, size=f"US {10 + n}", stock=1, sort_order=2 + n),
+            ]
+        )
+    session.commit()
+
+
+@pytest.mark.parametrize(
+    "detail",
+    [
+        pytest.param(lambda service, product: service.get_product_by_slug(product.slug), id="slug"),
+        pytest.param(
+            # A fresh version always misses the detail cache
+            lambda service, product: service.get_product_json(product.id, datetime.utcnow()),
+            id="json",
+        ),
+    ],
+)
+def test_detail_query_count_does_not_depend_on_variant_count(
+    session, statements, catalog, detail
+):
+    plain, rich = catalog[0], catalog[1]
+    _add_variants(session, rich, 8)
+    service = ProductService(session)
+
+    few = _count_statements(session, statements, lambda: detail(service, plain))
+    many = _count_statements(session, statements, lambda: detail(service, rich))
+
+    assert few == many
+
+
+def test_batch_query_count_does_not_depend_on_batch_size(session, statements, catalog):
+    service = ProductService(session)
+    ids = [product.id for product in catalog]
+    slugs = [product.slug for product in catalog]
+
+    one = _count_statements(session, statements, lambda: service.get_products_batch(ids[:1], []))
+    full = _count_statements(
+        session, statements, lambda: service.get_products_batch(ids[:3], slugs[3:])
+    )
+
+    assert one == full
+    assert len(service.get_products_batch(ids[:3], slugs[3:])) == PRODUCTS
+
+
+def test_listing_returns_page_and_total(session, catalog):
+    products, total = ProductService(session).get_products(page=2, page_size=4)
+
+    assert total == PRODUCTS
+    assert len(products) == PRODUCTS - 4
+
+
+@pytest.mark.parametrize(
+    ("cap", "total", "capped"),
+    [(PRODUCTS + 1, PRODUCTS, False), (PRODUCTS, PRODUCTS, False), (PRODUCTS - 1, PRODUCTS - 1, True)],
+)
+def test_total_is_capped_only_above_the_cap(client, catalog, monkeypatch, cap, total, capped):
+    monkeypatch.setattr("app.api.v1.products.settings.PRODUCT_COUNT_CAP", cap)
+
+    body = client.get("/api/v1/products", params={"page_size": 2}).json()
+
+    assert body["total"] == total
+    assert body["totalCapped"] is capped
+
+
+def test_list_etag_changes_when_an_older_product_is_deleted(client, session, catalog):
+    etag = client.get("/api/v1/products").headers["etag"]
+    assert client.get("/api/v1/products", headers={"If-None-Match": etag}).status_code == 304
+
+    oldest = catalog[0]
+    for row in (*oldest.images, *oldest.colors, *oldest.sizes, oldest):
+        session.delete(row)
+    session.commit()
+
+    response = client.get("/api/v1/products", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["total"] == PRODUCTS - 1
@@ -0,0 +1,47 @@
+import pytest
+
+from app.core.search import document_grams, query_grams
+from app.services.product_service import ProductService
+
+
+@pytest.fixture
+def catalog(make_product):
+    return {
+        "air": make_product(name="Nike Air Max"),
+        "pegasus": make_product(name="Pegasus 41", subtitle="慢跑鞋"),
+        "dunk": make_product(name="Dunk Low", description="Suede upper, 100% rubber sole"),
+    }
+
+
+def _names(session, search: str) -> list[str]:
+    items, _ = ProductService(session).get_products(search=search)
+    return [item.name for item in items]
+
+
+@pytest.mark.parametrize(
+    ("search", "expected"),
+    [
+        pytest.param("air", ["Nike Air Max"], id="trigram"),
+        pytest.param("ai", ["Nike Air Max"], id="prefix"),
+        pytest.param("ir", ["Nike Air Max"], id="inside-word"),
+        pytest.param("41", ["Pegasus 41"], id="digits"),
+        pytest.param("max ik", ["Nike Air Max"], id="mixed"),
+        pytest.param("跑鞋", ["Pegasus 41"], id="cjk"),
+        pytest.param("0%", ["Dunk Low"], id="like-wildcard"),
+        pytest.param("xy", [], id="no-match"),
+    ],
+)
+def test_search_matches_short_words_anywhere(session, catalog, search, expected):
+    assert _names(session, search) == expected
+
+
+def test_short_word_ranks_name_above_description(session, make_product):
+    make_product(name="Court Classic", description="Leather upper")
+    make_product(name="Leather Trainer")
+
+    assert _names(session, "le") == ["Leather Trainer", "Court Classic"]
+
+
+@pytest.mark.parametrize("word", ["a", "ir", "air", "max", "ike"])
+def test_query_words_of_any_length_are_indexed(word):
+    assert query_grams(word) <= document_grams("Nike Air Max")
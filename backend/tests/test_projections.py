@@ -0,0 +1,81 @@
+from sqlmodel import select, update
+
+from app.db.projections import refresh_product_cards, touch_stock
+from app.models import CatalogVersion, ProductCard, ProductSize
+from app.services.cart_service import _summary_cache
+from app.services.product_service import ProductService, _facet_cache
+
+
+def _version(session) -> int:
+    return session.exec(select(CatalogVersion.version)).one()
+
+
+def _sell_out(session, product, sizes=None):
+    session.exec(
+        update(ProductSize)
+        .where(ProductSize.product_id == product.id)
+        .where(*([ProductSize.size.in_(sizes)] if sizes else []))
+        .values(stock=0)
+    )
+
+
+def test_touch_stock_updates_the_card_without_reindexing(session, statements, make_product):
+    product = make_product()
+    version = _version(session)
+
+    _sell_out(session, product, sizes=["US 8"])
+    statements.clear()
+    touch_stock(session, [product.id])
+    session.commit()
+
+    assert not any("product_search_grams" in statement for statement in statements)
+    assert _version(session) == version
+
+    _sell_out(session, product)
+    touch_stock(session, [product.id])
+    session.commit()
+
+    card = session.get(ProductCard, product.id)
+    session.refresh(card)
+    assert card.in_stock is False
+    assert _version(session) == version + 1
+
+
+def test_refresh_product_cards_upserts_and_drops_deleted_products(session, make_product):
+    kept = make_product(name="Kept")
+    gone = make_product(name="Gone")
+    for row in (*gone.images, *gone.colors, *gone.sizes, gone):
+        session.delete(row)
+    session.flush()
+
+    refresh_product_cards(session.connection())
+    refresh_product_cards(session.connection(), [kept.id, gone.id])
+    session.commit()
+
+    products, total = ProductService(session).get_products()
+    assert [item.name for item in products] == ["Kept"]
+    assert total == 1
+
+
+def test_caches_are_cleared_only_by_the_changes_they_depend_on(session, make_product):
+    product = make_product()
+
+    def cached() -> tuple[bool, bool]:
+        return _facet_cache.get("probe") is not None, _summary_cache.get("probe") is not None
+
+    _facet_cache.set("probe", 1)
+    _summary_cache.set("probe", 1)
+    _sell_out(session, product)
+    touch_stock(session, [product.id])
+    session.commit()
+    # The sizes facet only counts sizes in stock
+    assert cached() == (False, True)
+
+    _facet_cache.set("probe", 1)
+    product.name = "Renamed"
+    session.commit()
+    assert cached() == (False, True)
+
+    product.price = 1200
+    session.commit()
+    assert cached() == (False, False)
@@ -5,7 +5,7 @@ import { useAuth } from '@/context/AuthContext'
 import { MobileMenu } from './MobileMenu'
 
 export function Header() {
-  const { cart, openDrawer } = useCart()
+  const { summary, openDrawer } = useCart()
   const { isAuthenticated } = useAuth()
   const navigate = useNavigate()
 
@@ -167,9 +167,9 @@ export function Header() {
                 <circle cx="20" cy="21" r="1" />
                 <path d="M1 1h4l2.68 13.39a2 2 0 0 0 2 1.61h9.72a2 2 0 0 0 2-1.61L23 6H6" />
               </svg>
-              {cart && cart.itemCount > 0 && (
+              {summary && summary.itemCount > 0 && (
                 <span className="absolute -top-1 -right-1 flex items-center justify-center w-5 h-5 bg-tcnr01-black text-white text-tcnr01-xs rounded-full">
-                  {cart.itemCount}
+                  {summary.itemCount}
                 </span>
               )}
             </button>
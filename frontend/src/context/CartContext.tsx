@@ -1,17 +1,20 @@
-import { createContext, useContext, useState, useCallback, type ReactNode } from 'react'
+import { createContext, useContext, useState, useCallback, useEffect, type ReactNode } from 'react'
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { cartService } from '@/services/cartService'
-import type { Cart, AddToCartRequest, UpdateCartItemRequest } from '@/types'
+import type { Cart, AddToCartRequest, CartOperation, CartSummary, UpdateCartItemRequest } from '@/types'
 
 interface CartContextType {
   cart: Cart | null
+  summary: CartSummary | null
   isLoading: boolean
   isDrawerOpen: boolean
   openDrawer: () => void
   closeDrawer: () => void
+  loadItems: () => void
   addItem: (request: AddToCartRequest) => Promise<void>
   updateItem: (itemId: string, request: UpdateCartItemRequest) => Promise<void>
   removeItem: (itemId: string) => Promise<void>
+  applyOperations: (operations: CartOperation[]) => Promise<void>
   clearCart: () => Promise<void>
 }
 
@@ -20,43 +23,74 @@ const CartContext = createContext<CartContextType | null>(null)
 export function CartProvider({ children }: { children: ReactNode }) {
   const queryClient = useQueryClient()
   const [isDrawerOpen, setIsDrawerOpen] = useState(false)
+  // 完整購物車只在抽屜或購物車 / 結帳頁需要時才載入，其他頁面只取摘要
+  const [itemsRequested, setItemsRequested] = useState(false)
 
-  const { data: cart, isLoading } = useQuery({
+  const { data: cart, isPending: isLoading } = useQuery({
     queryKey: ['cart'],
     queryFn: cartService.getCart,
+    enabled: itemsRequested,
   })
 
+  const { data: summary } = useQuery({
+    queryKey: ['cart', 'summary'],
+    queryFn: cartService.getSummary,
+  })
+
+  const setCart = useCallback(
+    (data: Cart) => {
+      queryClient.setQueryData(['cart'], data)
+      queryClient.setQueryData(['cart', 'summary'], {
+        itemCount: data.itemCount,
+        subtotal: data.subtotal,
+      })
+    },
+    [queryClient]
+  )
+
   const addItemMutation = useMutation({
     mutationFn: cartService.addItem,
     onSuccess: (data) => {
-      queryClient.setQueryData(['cart'], data)
+      setCart(data)
       setIsDrawerOpen(true)
     },
   })
 
+  // 編輯以目前顯示的購物車版本為前提；失敗（例如 412）時重新載入
+  const currentCart = () => queryClient.getQueryData<Cart>(['cart'])
+  const reloadCart = () => queryClient.invalidateQueries({ queryKey: ['cart'] })
+
   const updateItemMutation = useMutation({
     mutationFn: ({ itemId, request }: { itemId: string; request: UpdateCartItemRequest }) =>
-      cartService.updateItem(itemId, request),
-    onSuccess: (data) => {
-      queryClient.setQueryData(['cart'], data)
-    },
+      cartService.updateItem(itemId, request, currentCart()),
+    onSuccess: setCart,
+    onError: reloadCart,
   })
 
   const removeItemMutation = useMutation({
-    mutationFn: cartService.removeItem,
-    onSuccess: (data) => {
-      queryClient.setQueryData(['cart'], data)
-    },
+    mutationFn: (itemId: string) => cartService.removeItem(itemId, currentCart()),
+    onSuccess: setCart,
+    onError: reloadCart,
+  })
+
+  const applyOperationsMutation = useMutation({
+    mutationFn: (operations: CartOperation[]) =>
+      cartService.applyOperations(operations, currentCart()),
+    onSuccess: setCart,
+    onError: reloadCart,
   })
 
   const clearCartMutation = useMutation({
-    mutationFn: cartService.clearCart,
-    onSuccess: (data) => {
-      queryClient.setQueryData(['cart'], data)
-    },
+    mutationFn: () => cartService.clearCart(currentCart()),
+    onSuccess: setCart,
+    onError: reloadCart,
   })
 
-  const openDrawer = useCallback(() => setIsDrawerOpen(true), [])
+  const loadItems = useCallback(() => setItemsRequested(true), [])
+  const openDrawer = useCallback(() => {
+    setItemsRequested(true)
+    setIsDrawerOpen(true)
+  }, [])
   const closeDrawer = useCallback(() => setIsDrawerOpen(false), [])
 
   const addItem = useCallback(
@@ -80,6 +114,13 @@ export function CartProvider({ children }: { children: ReactNode }) {
     [removeItemMutation]
   )
 
+  const applyOperations = useCallback(
+    async (operations: CartOperation[]) => {
+      await applyOperationsMutation.mutateAsync(operations)
+    },
+    [applyOperationsMutation]
+  )
+
   const clearCart = useCallback(async () => {
     await clearCartMutation.mutateAsync()
   }, [clearCartMutation])
@@ -88,13 +129,16 @@ export function CartProvider({ children }: { children: ReactNode }) {
     <CartContext.Provider
       value={{
         cart: cart ?? null,
+        summary: summary ?? null,
         isLoading,
         isDrawerOpen,
         openDrawer,
         closeDrawer,
+        loadItems,
         addItem,
         updateItem,
         removeItem,
+        applyOperations,
         clearCart,
       }}
     >
@@ -103,10 +147,14 @@ export function CartProvider({ children }: { children: ReactNode }) {
   )
 }
 
-export function useCart() {
+export function useCart({ withItems = false }: { withItems?: boolean } = {}) {
   const context = useContext(CartContext)
   if (!context) {
     throw new Error('useCart must be used within CartProvider')
   }
+  const { loadItems } = context
+  useEffect(() => {
+    if (withItems) loadItems()
+  }, [withItems, loadItems])
   return context
 }
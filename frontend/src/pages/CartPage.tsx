@@ -5,7 +5,7 @@ import { Button } from '@/components/ui'
 import { formatPrice } from '@/utils/format'
 
 export default function CartPage() {
-  const { cart, isLoading, clearCart } = useCart()
+  const { cart, isLoading, clearCart } = useCart({ withItems: true })
   const navigate = useNavigate()
 
   const isEmpty = !cart || cart.items.length === 0
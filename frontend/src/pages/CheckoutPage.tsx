@@ -8,7 +8,7 @@ import { formatPrice } from '@/utils/format'
 import { useQueryClient } from '@tanstack/react-query'
 
 export default function CheckoutPage() {
-  const { cart, isLoading: cartLoading } = useCart()
+  const { cart, isLoading: cartLoading } = useCart({ withItems: true })
   const { user } = useAuth()
   const navigate = useNavigate()
   const queryClient = useQueryClient()
@@ -26,6 +26,7 @@ export default function CheckoutPage() {
   const [paymentMethod, setPaymentMethod] = useState('credit_card')
   const [notes, setNotes] = useState('')
   const [isSubmitting, setIsSubmitting] = useState(false)
+  const [queuePosition, setQueuePosition] = useState<number | null>(null)
   const [error, setError] = useState('')
 
   const isEmpty = !cart || cart.items.length === 0
@@ -71,23 +72,27 @@ export default function CheckoutPage() {
 
     setIsSubmitting(true)
     try {
-      const order = await orderService.createOrder({
-        recipient_name: recipientName,
-        recipient_phone: recipientPhone,
-        shipping_address: shippingAddress,
-        shipping_city: shippingCity || undefined,
-        shipping_state: shippingState || undefined,
-        shipping_postal_code: shippingPostalCode || undefined,
-        payment_method: paymentMethod,
-        notes: notes || undefined,
-      })
+      const orderId = await orderService.checkout(
+        {
+          recipient_name: recipientName,
+          recipient_phone: recipientPhone,
+          shipping_address: shippingAddress,
+          shipping_city: shippingCity || undefined,
+          shipping_state: shippingState || undefined,
+          shipping_postal_code: shippingPostalCode || undefined,
+          payment_method: paymentMethod,
+          notes: notes || undefined,
+        },
+        (ticket) => setQueuePosition(ticket.queuePosition ?? 0)
+      )
       queryClient.setQueryData(['cart'], null)
       queryClient.invalidateQueries({ queryKey: ['cart'] })
-      navigate(`/order-confirmation/${order.id}`)
+      navigate(`/order-confirmation/${orderId}`)
     } catch (err) {
       setError(err instanceof Error ? err.message : '下單失敗，請稍後再試')
     } finally {
       setIsSubmitting(false)
+      setQueuePosition(null)
     }
   }
 
@@ -291,7 +296,11 @@ export default function CheckoutPage() {
                 className="w-full"
                 disabled={isSubmitting}
               >
-                {isSubmitting ? '處理中...' : '確認下單'}
+                {queuePosition !== null
+                  ? `排隊中${queuePosition > 0 ? `（前面還有 ${queuePosition} 筆）` : '...'}`
+                  : isSubmitting
+                    ? '處理中...'
+                    : '確認下單'}
               </Button>
             </div>
           </div>
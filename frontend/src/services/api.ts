@@ -33,7 +33,7 @@ async function request<T>(endpoint: string, options: RequestOptions = {}): Promi
   const sessionId = getSessionId()
   const headers: Record<string, string> = {
     'Content-Type': 'application/json',
-    'X-Session-Id': sessionId,
+    ...(sessionId ? { 'X-Session-Id': sessionId } : {}),
     ...(fetchOptions.headers as Record<string, string>),
   }
 
@@ -65,6 +65,8 @@ async function request<T>(endpoint: string, options: RequestOptions = {}): Promi
     }
   }
 
+  rememberSessionId(response)
+
   if (!response.ok) {
     const error = await response.json().catch(() => ({ detail: 'Unknown error' }))
     throw new Error(error.detail || `HTTP ${response.status}`)
@@ -106,15 +108,16 @@ async function tryRefreshToken(): Promise<boolean> {
   return refreshPromise
 }
 
-function getSessionId(): string {
-  let sessionId = localStorage.getItem(SESSION_KEY)
+function getSessionId(): string | null {
+  return localStorage.getItem(SESSION_KEY)
+}
 
-  if (!sessionId) {
-    sessionId = crypto.randomUUID()
-    localStorage.setItem(SESSION_KEY, sessionId)
+// The server issues a session id on the first request that arrives without one
+function rememberSessionId(response: Response): void {
+  const issued = response.headers.get('X-Session-Id')
+  if (issued && !localStorage.getItem(SESSION_KEY)) {
+    localStorage.setItem(SESSION_KEY, issued)
   }
-
-  return sessionId
 }
 
 export function saveTokens(tokens: AuthTokens): void {
@@ -1,17 +1,33 @@
 import { api } from './api'
-import type { Cart, AddToCartRequest, UpdateCartItemRequest } from '@/types'
+import type { Cart, AddToCartRequest, CartOperation, CartSummary, UpdateCartItemRequest } from '@/types'
+
+// 與後端 ETag 相同的格式，編輯時帶上 If-Match，其他分頁先改過則回 412
+export function cartEtag(cart: Cart | null | undefined): string | undefined {
+  if (!cart) return undefined
+  return cart.version ? `"${cart.id}.${cart.version}"` : '"empty"'
+}
+
+function ifMatch(cart?: Cart | null) {
+  const etag = cartEtag(cart)
+  return etag ? { headers: { 'If-Match': etag } } : undefined
+}
 
 export const cartService = {
   getCart: () => api.get<Cart>('/cart'),
 
+  getSummary: () => api.get<CartSummary>('/cart/summary'),
+
   addItem: (request: AddToCartRequest) =>
     api.post<Cart>('/cart/items', request),
 
-  updateItem: (itemId: string, request: UpdateCartItemRequest) =>
-    api.put<Cart>(`/cart/items/${itemId}`, request),
+  updateItem: (itemId: string, request: UpdateCartItemRequest, cart?: Cart | null) =>
+    api.put<Cart>(`/cart/items/${itemId}`, request, ifMatch(cart)),
+
+  removeItem: (itemId: string, cart?: Cart | null) =>
+    api.delete<Cart>(`/cart/items/${itemId}`, ifMatch(cart)),
 
-  removeItem: (itemId: string) =>
-    api.delete<Cart>(`/cart/items/${itemId}`),
+  applyOperations: (operations: CartOperation[], cart?: Cart | null) =>
+    api.post<Cart>('/cart/batch', { operations }, ifMatch(cart)),
 
-  clearCart: () => api.delete<Cart>('/cart'),
+  clearCart: (cart?: Cart | null) => api.delete<Cart>('/cart', ifMatch(cart)),
 }
@@ -1,10 +1,52 @@
 import { api } from './api'
-import type { Order, OrderListItem, CreateOrderRequest } from '@/types'
+import type { CheckoutMode, CheckoutTicket, Order, OrderListItem, CreateOrderRequest } from '@/types'
+
+const TICKET_POLL_MS = 1000
+// 超過這段時間仍在排隊就放棄等待（訂單可能稍後仍會成立）
+const TICKET_MAX_WAIT_MS = 2 * 60 * 1000
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms))
 
 export const orderService = {
   createOrder: (data: CreateOrderRequest) =>
     api.post<Order>('/orders', data),
 
+  getCheckoutMode: () =>
+    api.get<CheckoutMode>('/orders/checkout-mode'),
+
+  queueOrder: (data: CreateOrderRequest) =>
+    api.post<CheckoutTicket>('/orders/queue', data),
+
+  getTicket: (id: string) =>
+    api.get<CheckoutTicket>(`/orders/tickets/${id}`),
+
+  // 伺服器開啟排隊結帳時送出後輪詢直到訂單成立，否則直接下單；回傳訂單 ID
+  checkout: async (
+    data: CreateOrderRequest,
+    onQueued?: (ticket: CheckoutTicket) => void
+  ): Promise<string> => {
+    const mode = await orderService.getCheckoutMode()
+    if (!mode.queue) {
+      const order = await orderService.createOrder(data)
+      return order.id
+    }
+
+    let ticket = await orderService.queueOrder(data)
+    const deadline = Date.now() + TICKET_MAX_WAIT_MS
+    while (ticket.status === 'queued') {
+      if (Date.now() > deadline) {
+        throw new Error('結帳仍在處理中，請稍後確認訂單，勿重複下單')
+      }
+      onQueued?.(ticket)
+      await sleep(TICKET_POLL_MS)
+      ticket = await orderService.getTicket(ticket.id)
+    }
+    if (ticket.status === 'failed' || !ticket.orderId) {
+      throw new Error(ticket.error || '下單失敗，請稍後再試')
+    }
+    return ticket.orderId
+  },
+
   getOrders: () =>
     api.get<OrderListItem[]>('/orders'),
 
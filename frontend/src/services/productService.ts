@@ -26,4 +26,7 @@ export const productService = {
 
   getProductBySlug: (slug: string) =>
     api.get<Product>(`/products/${slug}`),
+
+  getProductsBatch: (request: { ids?: string[]; slugs?: string[] }) =>
+    api.post<{ data: Product[] }>('/products/batch', request),
 }
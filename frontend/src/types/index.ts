@@ -68,10 +68,16 @@ export interface Cart {
   items: CartItem[]
   itemCount: number
   subtotal: number
+  version: number
   createdAt: string
   updatedAt: string
 }
 
+export interface CartSummary {
+  itemCount: number
+  subtotal: number
+}
+
 // API 回應類型
 export interface ApiResponse<T> {
   data: T
@@ -98,6 +104,11 @@ export interface UpdateCartItemRequest {
   quantity: number
 }
 
+export type CartOperation =
+  | ({ op: 'add' } & AddToCartRequest)
+  | { op: 'update'; itemId: string; quantity: number }
+  | { op: 'remove'; itemId: string }
+
 // 使用者相關類型
 export interface User {
   id: string
@@ -182,6 +193,20 @@ export interface Order {
   updatedAt: string
 }
 
+export interface CheckoutMode {
+  queue: boolean
+}
+
+export interface CheckoutTicket {
+  id: string
+  status: 'queued' | 'completed' | 'failed'
+  orderId?: string | null
+  error?: string | null
+  queuePosition?: number | null
+  createdAt: string
+  updatedAt: string
+}
+
 export interface OrderListItem {
   id: string
   orderNumber: string